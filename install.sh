@@ -2,3 +2,9 @@
 
 cp -r awk ~/bin
 chmod -R 775 ~/bin/awk/*
+
+# backport of os.scandir for the directory scan of asmgraph.py on Python 2
+pip install --user scandir
+
+# the .xz and .zst summary files and traces are skipped without these
+pip install --user backports.lzma zstandard
@@ -0,0 +1,376 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import logging
+import multiprocessing
+
+import numpy as np
+
+import asmgraph
+
+logging.basicConfig(level=logging.INFO)
+
+'''
+Comparison of the results of two sweeps.
+
+The runs under the baseline and the candidate directories are matched by
+their summary file names, which hold all the parameters of path_filter.
+The relative deltas (candidate - baseline) / |baseline| of the metrics of
+_METRICS are computed for all the matched runs at once, and the runs
+whose deltas exceed the thresholds are reported. A delta is worse when
+the metric grows and it is one which should not grow, or when it shrinks
+and it is a hit ratio. The exit status is 1 if any delta is worse than
+its threshold, so the comparison can gate a change of the simulator.
+'''
+
+'''
+Metrics of the comparison
+-------------------------
+(metric name, columns of the result table which are summed, True if a
+larger value is worse)
+'''
+_METRICS = (
+    ('energy', tuple(state + '_energy' for state in asmgraph._ENERGY_STATES),
+     True),
+) + tuple(
+    (state + '_energy', (state + '_energy',), True)
+    for state in asmgraph._ENERGY_STATES
+) + (
+    ('averageresponsetime', ('averageresponsetime',), True),
+    ('memory_read_hit', ('memory_read_hit',), False),
+    ('memory_write_hit', ('memory_write_hit',), False),
+    ('cache_disk_hit', ('cache_disk_hit',), False),
+    ('spindowncount', ('spindowncount',), True),
+    ('spinupcount', ('spinupcount',), True),
+    ('bufferoverflowcount', ('bufferoverflowcount',), True),
+    ('elapsedtime', ('elapsedtime',), True),
+)
+
+_THRESHOLD = 0.05
+# the wall clock time of a run depends on the load of the machine
+_THRESHOLDS = {'elapsedtime': 0.2}
+
+_REPORT_FORMAT = ('run:%s\tmetric:%s\tbaseline:%.6g\tcandidate:%.6g'
+                  '\tdelta:%+.2f%%\t%s')
+_SUMMARY_FORMAT = '%-20s %9s %7s %7s %9s %9s'
+
+
+def load_results(root, num_workers=1):
+    '''
+    Return a dictionary which maps the run names of the summary files
+    under the root which pass the conditions of -COND to the lists of
+    their SimResult objects, which have more than one object for the
+    replicate runs of a configuration.
+    '''
+    paths = asmgraph.find_sim_results(root)
+    results = {}
+    for obj in asmgraph.parse_sim_results(paths, num_workers):
+        name = asmgraph.get_run_name(obj.path)
+        results.setdefault(name, []).append(obj)
+    return results
+
+
+def build_table(objs):
+    '''
+    Return the result table of the SimResult objects in the order of their
+    run names.
+    '''
+    table = asmgraph.build_result_table(objs)
+    names = [asmgraph.get_run_name(asmgraph._export_value(p))
+             for p in table['path'].tolist()]
+    return table[np.argsort(names, kind='mergesort')]
+
+
+def get_metric_values(table):
+    '''
+    Return a dictionary which maps the metrics of _METRICS to the arrays
+    of their values of the rows of the table.
+    '''
+    return dict((name, sum(table[c].astype(np.float64) for c in columns))
+                for name, columns, larger_is_worse in _METRICS)
+
+
+def get_relative_deltas(base, cand):
+    '''
+    Return (cand - base) / |base|, which is 0 where both are 0 and
+    infinite where only base is 0.
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        delta = (cand - base) / np.abs(base)
+    delta[(base == 0) & (cand == 0)] = 0
+    return delta
+
+
+def compare_results(base_results, cand_results):
+    '''
+    Match the runs of the dictionaries of load_results and return the run
+    names of the matched runs, the dictionaries of the metric values of
+    the baseline and the candidate, and the dictionary of the relative
+    deltas. The arrays are in the order of the names, and the values of
+    the replicate runs are their means.
+    '''
+    names = sorted(set(base_results) & set(cand_results))
+    base = get_metric_values(build_table(
+        [obj for n in names for obj in base_results[n]]))
+    cand = get_metric_values(build_table(
+        [obj for n in names for obj in cand_results[n]]))
+    deltas = dict((name, get_relative_deltas(base[name], cand[name]))
+                  for name, columns, larger_is_worse in _METRICS)
+    return names, base, cand, deltas
+
+
+def get_threshold(thresholds, metric):
+    return thresholds.get(metric, thresholds.get(None, _THRESHOLD))
+
+
+def classify_deltas(deltas, thresholds):
+    '''
+    Return the dictionaries which map the metrics to the masks of the
+    runs whose deltas are worse and better than the thresholds.
+    '''
+    worse = {}
+    better = {}
+    for name, columns, larger_is_worse in _METRICS:
+        threshold = get_threshold(thresholds, name)
+        sign = 1 if larger_is_worse else -1
+        worse[name] = deltas[name] * sign > threshold
+        better[name] = deltas[name] * sign < -threshold
+    return worse, better
+
+
+def format_report(names, base, cand, deltas, worse, better):
+    '''
+    Return the lines of the runs whose deltas exceed the thresholds, by
+    metric and by the size of the delta.
+    '''
+    lines = []
+    for name, columns, larger_is_worse in _METRICS:
+        for verdict, mask in (('worse', worse[name]),
+                              ('better', better[name])):
+            ids = np.nonzero(mask)[0]
+            ids = ids[np.argsort(-np.abs(deltas[name][ids]), kind='mergesort')]
+            lines.extend(_REPORT_FORMAT % (names[i], name, base[name][i],
+                                           cand[name][i],
+                                           deltas[name][i] * 100, verdict)
+                         for i in ids)
+    return lines
+
+
+def format_summary(deltas, worse, better, thresholds):
+    '''
+    Return the lines of the table of the numbers of the worse and the
+    better runs and the median and the largest deltas of every metric.
+    '''
+    lines = [_SUMMARY_FORMAT % ('metric', 'threshold', 'worse', 'better',
+                                'median', 'max')]
+    for name, columns, larger_is_worse in _METRICS:
+        delta = deltas[name]
+        finite = delta[np.isfinite(delta)]
+        if len(delta) == 0:
+            median = largest = '-'
+        else:
+            median = ('%+.2f%%' % (np.median(finite) * 100)
+                      if len(finite) else '-')
+            largest = delta[np.argmax(np.abs(np.nan_to_num(delta)))]
+            largest = '%+.2f%%' % (largest * 100)
+        lines.append(_SUMMARY_FORMAT % (
+            name, '%.1f%%' % (get_threshold(thresholds, name) * 100),
+            worse[name].sum(), better[name].sum(), median, largest))
+    return lines
+
+
+def build_compare_table(names, base, cand, deltas):
+    '''
+    Return a numpy structured array of the run names and the baseline,
+    the candidate and the delta of every metric of the matched runs.
+    '''
+    descr = [('run', 'S%d' % max([1] + [len(n) for n in names]))]
+    for name, columns, larger_is_worse in _METRICS:
+        descr.extend((prefix + name, 'f8')
+                     for prefix in ('base_', 'cand_', 'delta_'))
+    table = np.zeros(len(names), dtype=descr)
+    table['run'] = names
+    for name, columns, larger_is_worse in _METRICS:
+        table['base_' + name] = base[name]
+        table['cand_' + name] = cand[name]
+        table['delta_' + name] = deltas[name]
+    return table
+
+
+def plot_comparison(fig, deltas, worse, better, thresholds):
+    '''
+    x axis: matched runs in the order of their names
+    y axis: relative delta of every metric
+    The runs which are worse than the thresholds are red, the better ones
+    are green, and the thresholds are the dashed lines.
+    '''
+    num_cols = 2
+    num_rows = (len(_METRICS) + num_cols - 1) // num_cols
+    fig.set_size_inches(12, 2 * num_rows)
+    fig.subplots_adjust(left=0.08, right=0.97, top=0.95, bottom=0.05,
+                        hspace=0.4, wspace=0.2)
+    for i, (name, columns, larger_is_worse) in enumerate(_METRICS):
+        ax = fig.add_subplot(num_rows, num_cols, i + 1)
+        delta = np.clip(deltas[name], -10, 10) * 100
+        ind = np.arange(len(delta))
+        normal = ~(worse[name] | better[name])
+        ax.plot(ind[normal], delta[normal], '.', color='0.5', markersize=3)
+        ax.plot(ind[worse[name]], delta[worse[name]], '.', color='r')
+        ax.plot(ind[better[name]], delta[better[name]], '.', color='g')
+        threshold = get_threshold(thresholds, name) * 100
+        for y in (threshold, -threshold):
+            ax.axhline(y, color='k', linestyle='--', linewidth=0.5)
+        ax.set_xlim(-0.5, max(len(delta), 1) - 0.5)
+        ax.set_title(name, size=10)
+        ax.set_ylabel('Delta [%]', size=8)
+        ax.tick_params(labelsize=8)
+
+
+def save_plot(path, deltas, worse, better, thresholds):
+    '''
+    Save the figure of plot_comparison to the path in the format of its
+    extension.
+    '''
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    plot_comparison(fig, deltas, worse, better, thresholds)
+    fig.savefig(path)
+
+
+def parse_thresholds(thresholds, arg):
+    '''
+    Add the thresholds of -t, e.g. "0.1" or "energy=0.02,elapsedtime=0.5",
+    to the dictionary of the thresholds of the metrics. The key of a
+    threshold without a metric is None.
+    '''
+    metrics = [name for name, columns, larger_is_worse in _METRICS]
+    for item in arg.split(','):
+        if '=' in item:
+            name, value = item.split('=')
+            if name not in metrics:
+                raise ValueError('unknown metric: ' + name)
+            thresholds[name] = float(value)
+        else:
+            thresholds[None] = float(item)
+
+
+def print_usage(command_name):
+    sys.stdout.write('''
+Usage:
+
+python %s -B<dir> -D<dir> [-COND...] [-t<threshold>] [-t<metric>=<threshold>,...] \
+[-E<file>] [-P<file>] [-j[n]]
+
+  Compare the results of the runs under the candidate directory -D with
+  the ones of the same parameters under the baseline directory -B. The
+  runs whose metrics differ more than the thresholds are printed, and
+  the exit status is 1 if any of them is worse. The exit status is 2 if
+  the arguments are wrong or no runs are matched.
+
+  -B<dir>   the baseline directory.
+  -D<dir>   the candidate directory.
+  -COND...  compare only the runs which match the conditions of -COND of
+            asmgraph.py.
+  -t<threshold>
+            the threshold of the relative deltas of all the metrics, e.g.
+            0.05 for 5%%. (default: %g, and %s)
+  -t<metric>=<threshold>,...
+            the thresholds of the metrics of %s.
+  -E<file>  write the baseline, the candidate and the delta of every
+            metric of every matched run to <file> in CSV, JSON or NPY by
+            the extension of <file>.
+  -P<file>  plot the deltas of all the matched runs to <file> in the
+            format of its extension.
+  -j[n]     parse the summary files with n worker processes.
+            n defaults to the number of CPUs.
+''' % (command_name, _THRESHOLD,
+       ', '.join('%g for %s' % (v, k) for k, v in sorted(_THRESHOLDS.items())),
+       ', '.join(name for name, columns, larger_is_worse in _METRICS)))
+
+
+def main(args):
+    base_dir = None
+    cand_dir = None
+    thresholds = dict(_THRESHOLDS)
+    export_path = None
+    plot_path = None
+    num_workers = 1
+    for item in args:
+        if item.startswith('-B'):
+            base_dir = item[2:]
+        elif item.startswith('-D'):
+            cand_dir = item[2:]
+        elif item.startswith('-COND') or item.startswith('-t'):
+            # a bad argument is not a regression, so it has its own status
+            try:
+                if item.startswith('-COND'):
+                    asmgraph.parse_conditions(item[5:])
+                else:
+                    parse_thresholds(thresholds, item[2:])
+            except (KeyError, ValueError):
+                logging.error('bad argument: ' + item)
+                return 2
+        elif item.startswith('-E'):
+            export_path = item[2:]
+            fmt = os.path.splitext(export_path)[1][1:].lower()
+            if fmt not in asmgraph._EXPORT_FORMATS:
+                logging.error('unknown export format: ' + export_path)
+                print_usage(sys.argv[0])
+                return 2
+        elif item.startswith('-P'):
+            plot_path = item[2:]
+        elif item.startswith('-j'):
+            if item[2:]:
+                num_workers = int(item[2:])
+            else:
+                num_workers = multiprocessing.cpu_count()
+    if not base_dir or not cand_dir:
+        logging.error('both -B and -D are needed')
+        return 2
+    for d in (base_dir, cand_dir):
+        if not os.path.isdir(d):
+            logging.error('no directory ' + d)
+            return 2
+
+    base_results = load_results(base_dir, num_workers)
+    cand_results = load_results(cand_dir, num_workers)
+    names, base, cand, deltas = compare_results(base_results, cand_results)
+    only_base = len(set(base_results) - set(cand_results))
+    only_cand = len(set(cand_results) - set(base_results))
+    logging.info('%d matched runs, %d only in %s, %d only in %s'
+                 % (len(names), only_base, base_dir, only_cand, cand_dir))
+    if not names:
+        logging.error('no runs to compare')
+        return 2
+
+    worse, better = classify_deltas(deltas, thresholds)
+    for line in (format_report(names, base, cand, deltas, worse, better)
+                 + format_summary(deltas, worse, better, thresholds)):
+        sys.stdout.write(line + '\n')
+
+    if export_path:
+        fmt = os.path.splitext(export_path)[1][1:].lower()
+        with open(export_path, 'wb' if fmt == 'npy' else 'w') as f:
+            asmgraph.write_export_table(
+                f, build_compare_table(names, base, cand, deltas), fmt)
+    if plot_path:
+        save_plot(plot_path, deltas, worse, better, thresholds)
+
+    num_worse = sum(mask.sum() for mask in worse.values())
+    if num_worse:
+        logging.info('%d metrics of the runs are worse than the thresholds'
+                     % num_worse)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '-help'):
+        print_usage(sys.argv[0])
+        exit()
+
+    sys.exit(main(sys.argv[1:]))
@@ -3,18 +3,41 @@
 import os
 import sys
 import re
+import csv
+import json
+import time
+import hashlib
 import logging
+import calendar
+import functools
+import threading
+import multiprocessing
+from collections import deque
+from multiprocessing.pool import ThreadPool
+from contextlib import contextmanager
+
+try:
+    from os import scandir as _scandir
+except ImportError:
+    try:
+        from scandir import scandir as _scandir
+    except ImportError:
+        _scandir = None
 
 import numpy as np
-import matplotlib as mpl
-if 'darwin' != sys.platform:
-    mpl.use('Agg')
 
-import matplotlib.pyplot as plt
-from matplotlib.gridspec import GridSpec
+from resultstore import ResultStore
+from compressed import open_file, is_compressed, strip_suffix, find_file
+from compressed import read_tail, DECOMPRESS_ERRORS, MissingModuleError
+from profiler import Profiler, get_cpu_time
+import diskperf
 
 logging.basicConfig(level=logging.INFO)
 
+if _scandir is None:
+    logging.warning('scandir is not installed: every directory entry is '
+                    'stat\'ed by the scan. install it with install.sh')
+
 '''
 Parameter names of filter are follows
 --------------------------------------
@@ -35,7 +58,48 @@ wl_data_size
 '''
 path_filter = re.compile(r'^DD(?P<num_dd>\d+)CD(?P<num_cd>\d+)NM(?P<num_mem>\d+)MS(?P<mem_size>\d+)R(?P<rep_level>\d+)SM(?P<storage_manager>[a-zA-Z]+)CMA(?P<mem_assignor>[a-zA-Z]+)CMF(?P<memory_manager>[a-zA-Z]+)BS\d+BM(?P<buffer_manager>[a-zA-Z]+)_Wworkload\.(?P<wl_hour>\d+)h\.rr(?P<wl_read_ratio>\d)\.lam(?P<wl_lambda>\d+)\.the(?P<wl_zipf_factor>\d+)\.ds(?P<wl_data_size>\d+)[KMGT]B$')
 
-_PLOT_TYPE = ('energy', 'response', 'overflow', 'spin', 'hit', 'statetime')
+_PLOT_TYPE = ('energy', 'response', 'overflow', 'spin', 'hit', 'statetime',
+              'tail', 'throughput', 'dashboard', 'heatmap', 'timeseries')
+
+# panels of the dashboard plot from the top
+_DASHBOARD_PLOTS = ('energy', 'response', 'overflow', 'spin', 'hit',
+                    'statetime')
+
+# file names of the figures of each plot type
+_PLOT_FILE_NAMES = {
+    'energy': 'energy',
+    'response': 'avg_response',
+    'overflow': 'overflow',
+    'spin': 'spindownup',
+    'hit': 'cache_hit',
+    'statetime': 'state_time',
+    'tail': 'tail_latency',
+    'throughput': 'throughput',
+    'dashboard': 'dashboard',
+    'heatmap': 'disk_heatmap',
+    'timeseries': 'time_series',
+}
+
+# disk traces of a run, which are in <trace dir>/<summary file name>/
+_TRACE_FILES = ('DataDiskPerf.out', 'CacheDiskPerf.out')
+_ROTATION_FILE = 'DiskRotationRatio.out'
+
+# plot types which need the disk traces of -T
+_TRACE_PLOTS = ('tail', 'heatmap', 'timeseries')
+
+'''
+Array columns of the result table
+---------------------------------
+(column name, dtype, padding)
+The arrays of the runs of a group have the same length in the table, and
+the shorter ones are padded.
+'''
+_ARRAY_COLUMNS = (
+    (('disk_count', 'i8', 0), ('disk_avgresp', 'f8', 0),
+     ('disk_hitratio', 'f8', np.nan)),
+    (('ts_count', 'i8', 0), ('ts_avgresp', 'f8', np.nan),
+     ('ts_maxresp', 'f8', np.nan), ('ts_hitratio', 'f8', np.nan)),
+)
 
 _CONDITION_TRANSLATE_TABLE = {
     'NM': 'num_mem',
@@ -69,80 +133,396 @@ _output_dir = None
 _conditions = {} # conditions of workload characteristics
 _sim_results = {}
 _file_formats = ['eps', 'png']
+_num_workers = 1
+_num_walkers = 8 # threads which list the directories concurrently
+_group_by = [] # filter parameters which partition the results by --group-by
+_group = [] # (parameter, value) pairs of the group being rendered
+_store_path = None
+_ingest = False
+_force = False
+_trace_dir = None
+_watch_interval = None # seconds between the polls of --watch
+_window = None # seconds of a window of the timeseries plot
+_pipeline_size = None # queue size of --pipeline
+_profile = False
+_profile_path = None # JSON file of --profile
+_cprofile_stage = None
+_profiler = None # Profiler of the run when --profile is given
+_export_path = None
+_throughput = False
+
+_EXPORT_FORMATS = ('csv', 'json', 'npy')
+
+# layout version of the records saved in the result store. bump it when
+# the attributes of SimResult, Energy or WorkloadParam are changed.
+_STORE_VERSION = 3
+
+# version of the figures recorded in the manifest of the output directory.
+# bump it when the plot_* functions are changed.
+_RENDER_VERSION = 2
+_MANIFEST_NAME = '.asmgraph_manifest.json'
+
+# columns of the result table by which --throughput breaks down the
+# speed of the simulator
+_THROUGHPUT_KEYS = ('buffermanagerfactory', 'storagemanagerfactory',
+                    'replicalevel', 'wl_readratio', 'wl_arrivalrate',
+                    'wl_zipffactor', 'wl_datasize')
+
+_WATCH_INTERVAL = 30
+# files being parsed and figures being rendered at a time by --pipeline
+_PIPELINE_SIZE = 64
+# a summary file is complete when its last line is Elapsed Time, which is
+# searched in this many bytes at the end of the file
+_SUMMARY_TAIL_SIZE = 4096
+_ELAPSED_TIME_LINE = re.compile(r'^[ \t]*Elapsed Time[ \t]*:.*\S.*\s*\Z',
+                                re.M)
+
+_ENERGY_STATES = ('active', 'idle', 'standby', 'spindown', 'spinup')
+
+'''
+Columns of the result table
+---------------------------
+(column name, dtype, attribute of SimResult)
+A dtype of 'S' means a byte string which is as wide as the longest value.
+'''
+_RESULT_COLUMNS = (
+    ('path', 'S', 'path'),
+    ('numdatadisk', 'i4', 'numdatadisk'),
+    ('numcachedisk', 'i4', 'numcachedisk'),
+    ('replicalevel', 'i4', 'replicalevel'),
+    ('nummemories', 'i4', 'nummemories'),
+    ('memsize', 'i8', 'memsize'),
+    ('blocksize', 'i8', 'blocksize'),
+    ('memoryassignor', 'S', 'memoryassignor'),
+    ('memoryfactory', 'S', 'memoryfactory'),
+    ('storagemanagerfactory', 'S', 'storagemanagerfactory'),
+    ('buffermanagerfactory', 'S', 'buffermanagerfactory'),
+    ('wl_hour', 'i4', 'workload.hour'),
+    ('wl_readratio', 'i4', 'workload.readratio'),
+    ('wl_arrivalrate', 'i4', 'workload.arrivalrate'),
+    ('wl_zipffactor', 'i4', 'workload.zipffactor'),
+    ('wl_datasize', 'S', 'workload.datasize'),
+    ('averageresponsetime', 'f8', 'averageresponsetime'),
+    ('readrequestcount', 'i8', 'readrequestcount'),
+    ('writerequestcount', 'i8', 'writerequestcount'),
+    ('memory_read_count', 'i8', 'memory_read_count'),
+    ('memory_read_hit', 'f8', 'memory_read_hit'),
+    ('memory_write_count', 'i8', 'memory_write_count'),
+    ('memory_write_hit', 'f8', 'memory_write_hit'),
+    ('averagedatadiskresponsetime', 'f8', 'averagedatadiskresponsetime'),
+    ('datadiskaccesscount', 'i8', 'datadiskaccesscount'),
+    ('datadiskreadcount', 'i8', 'datadiskreadcount'),
+    ('datadiskwritecount', 'i8', 'datadiskwritecount'),
+    ('averagecachediskresponsetime', 'f8', 'averagecachediskresponsetime'),
+    ('cache_disk_read_count', 'i8', 'cache_disk_read_count'),
+    ('cache_disk_hit', 'f8', 'cache_disk_hit'),
+    ('cache_disk_write_count', 'i8', 'cache_disk_write_count'),
+    ('spindowncount', 'i8', 'spindowncount'),
+    ('spinupcount', 'i8', 'spinupcount'),
+    ('bufferoverflowcount', 'i8', 'bufferoverflowcount'),
+    ('totalrequestcount', 'i8', 'totalrequestcount'),
+    ('starttime', 'f8', 'starttime'),
+    ('endtime', 'f8', 'endtime'),
+    ('simulationtime', 'f8', 'simulationtime'),
+    ('elapsedtime', 'f8', 'elapsedtime'),
+) + tuple(
+    ('resp_' + name, 'f8', 'resp_' + name)
+    for name in diskperf._QUANTILE_NAMES
+) + (
+    ('ts_window', 'f8', 'ts_window'),
+) + tuple(
+    (state + suffix, 'f8', 'energy.' + state + suffix)
+    for state in _ENERGY_STATES
+    for suffix in ('_energy', '_totaltime', '_averagetime')
+)
+
+'''
+Configuration columns of the result table, which are the same in the
+replicate runs of a configuration and are kept by aggregate_replicates.
+The other numeric columns are the metrics of the runs.
+'''
+_CONFIG_COLUMNS = ('numdatadisk', 'numcachedisk', 'replicalevel',
+                   'nummemories', 'memsize', 'blocksize', 'wl_hour',
+                   'wl_readratio', 'wl_arrivalrate', 'wl_zipffactor')
+
+# 97.5% quantiles of Student's t distribution of 1 to 30 degrees of
+# freedom for the 95% confidence intervals of the replicate runs
+_T_QUANTILES = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306,
+                2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120,
+                2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064,
+                2.060, 2.056, 2.052, 2.048, 2.045, 2.042)
+_Z_QUANTILE = 1.959964
+# prefixes of the columns of the result table which are read from the
+# disk traces of -T
+_TRACE_COLUMN_PREFIXES = ('resp_', 'disk_', 'ts_')
+# error bars of the confidence intervals of the bar plots
+_ERROR_KW = {'ecolor': 'k', 'capsize': 2, 'elinewidth': 1}
+
+
+_NUMBER = r'(-?\d[\d,]*(?:\.\d+)?)'
+_NUMBER_PREFIX = re.compile(_NUMBER)
+_COUNT_RATIO = re.compile(_NUMBER + r'\(' + _NUMBER + r'\)$')
+_ENERGY_VALUES = re.compile(
+    _NUMBER + r'\(' + _NUMBER + r'\s*:\s*' + _NUMBER + r'\)$')
+
+
+def _to_num(s, conv=int):
+    return conv(s.replace(',', ''))
+
+
+def _match(regex, s):
+    m = regex.match(s)
+    if m is None:
+        raise ValueError(s)
+    return m
+
+
+def _int_value(s):
+    # "30 (10disks/memory)", "4,294,967,296Byte", "0(0)"
+    return _to_num(_match(_NUMBER_PREFIX, s).group(1))
+
+
+def _float_value(s):
+    return _to_num(_match(_NUMBER_PREFIX, s).group(1), float)
+
+
+def _count_ratio(s):
+    # "1,234(0.5678)"
+    m = _match(_COUNT_RATIO, s)
+    return _to_num(m.group(1)), _to_num(m.group(2), float)
+
+
+def _energy_values(s):
+    # "4,752,120.4938(428,118.9638 : 0.0103)"
+    return tuple(_to_num(v, float) for v in _match(_ENERGY_VALUES, s).groups())
+
+
+def _str_value(s):
+    return s.lower()
+
+
+def _timestamp(s):
+    # "Wed Jul 31 18:43:45 JST 2013", the time zone is ignored
+    t = s.split()
+    if len(t) != 6:
+        raise ValueError(s)
+    return float(calendar.timegm(
+        time.strptime(' '.join(t[:4] + t[5:]), '%a %b %d %H:%M:%S %Y')))
+
+
+def _class_name(suffix):
+    '''
+    Return a converter which takes the short name of a factory class,
+    e.g. "normal" of "sim.storage.manager.NormalStorageManagerFactory".
+    '''
+    def convert(s):
+        name = s.split('.')[-1].lower()
+        if suffix not in name:
+            raise ValueError(s)
+        return name[:name.find(suffix)]
+    return convert
+
+
+def _workload_param(s):
+    # "config/workload/workload.12h.rr0.lam30.the12.ds10TB"
+    try:
+        return WorkloadParam(s.split('/')[-1].lower().split('.'))
+    except IndexError:
+        raise ValueError(s)
+
 
-class SimResult:
+'''
+Fields of the summary file
+--------------------------
+label: (attributes of SimResult, converter)
+The label is the text before the first ':' or '=' of the line which is
+lowercased, without the parenthesized parts and the repeated spaces. A
+converter of several attributes returns a tuple of the values.
+'''
+_SUMMARY_FIELDS = {
+    'starting time at': (('starttime',), _timestamp),
+    'data disks': (('numdatadisk',), _int_value),
+    'cache disks': (('numcachedisk',), _int_value),
+    'replicas': (('replicalevel',), _int_value),
+    'number of cache memories': (('nummemories',), _int_value),
+    'memory size': (('memsize',), _int_value),
+    'block size': (('blocksize',), _int_value),
+    'cachememoryassignor': (('memoryassignor',), _str_value),
+    'cachememoryfactory': (('memoryfactory',), _class_name('region')),
+    'storagemanagerfactory': (
+        ('storagemanagerfactory',), _class_name('storage')),
+    'buffermanagerfactory': (
+        ('buffermanagerfactory',), _class_name('buffer')),
+    'workload': (('workload',), _workload_param),
+    'simulation time': (('simulationtime',), _float_value),
+    'avg. response time': (('averageresponsetime',), _float_value),
+    'total request count': (('totalrequestcount',), _int_value),
+    'read request count': (('readrequestcount',), _int_value),
+    'write request count': (('writerequestcount',), _int_value),
+    'cache memory read count': (
+        ('memory_read_count', 'memory_read_hit'), _count_ratio),
+    'cache memory write count': (
+        ('memory_write_count', 'memory_write_hit'), _count_ratio),
+    'avg. data disk response time': (
+        ('averagedatadiskresponsetime',), _float_value),
+    'data disk access count': (('datadiskaccesscount',), _int_value),
+    'data disk read access count': (('datadiskreadcount',), _int_value),
+    'data disk write access count': (('datadiskwritecount',), _int_value),
+    'avg. cache disk response time': (
+        ('averagecachediskresponsetime',), _float_value),
+    'cache disk read access count': (
+        ('cache_disk_read_count', 'cache_disk_hit'), _count_ratio),
+    'cache disk write access count': (
+        ('cache_disk_write_count',), _int_value),
+    'spindown count': (('spindowncount',), _int_value),
+    'spinup count': (('spinupcount',), _int_value),
+    'buffer overflow count': (('bufferoverflowcount',), _int_value),
+    'end time at': (('endtime',), _timestamp),
+    'elapsed time': (('elapsedtime',), _float_value),
+}
+_SUMMARY_FIELDS.update(
+    (state, (tuple('energy.' + state + suffix
+                   for suffix in ('_energy', '_totaltime', '_averagetime')),
+             _energy_values))
+    for state in _ENERGY_STATES)
+
+# fields without which a run has no x tick label or title. A summary file
+# which misses one of them or has an unknown factory in it is rejected.
+_REQUIRED_FIELDS = ('storagemanagerfactory', 'buffermanagerfactory',
+                    'workload')
+
+_SUMMARY_LINE = re.compile(r'^[ \t]*([^:=\n]+?)[ \t]*[:=]([^\n]*)', re.M)
+_PARENTHESIZED = re.compile(r'\([^)]*\)')
+
+
+def _summary_label(label):
+    return ' '.join(_PARENTHESIZED.sub(' ', label).lower().split())
+
+
+class _Record(object):
+    '''
+    Base class of the parsed records. The values are kept in __slots__
+    and the records are pickled as the dictionaries of them.
+    '''
+
+    __slots__ = ()
+
+    def __getstate__(self):
+        return dict((k, getattr(self, k))
+                    for k in self.__slots__ if hasattr(self, k))
+
+    def __setstate__(self, state):
+        for k, v in state.items():
+            setattr(self, k, v)
+
+    @classmethod
+    def from_state(cls, state):
+        obj = cls.__new__(cls)
+        obj.__setstate__(state)
+        return obj
+
+
+class SimResult(_Record):
+
+    __slots__ = (
+        'path', 'numdatadisk', 'numcachedisk', 'replicalevel',
+        'nummemories', 'memsize', 'blocksize', 'memoryassignor',
+        'memoryfactory', 'storagemanagerfactory', 'buffermanagerfactory',
+        'workload', 'energy', 'averageresponsetime',
+        'readrequestcount', 'writerequestcount',
+        'memory_read_count', 'memory_read_hit',
+        'memory_write_count', 'memory_write_hit',
+        'averagedatadiskresponsetime', 'datadiskaccesscount',
+        'datadiskreadcount', 'datadiskwritecount',
+        'averagecachediskresponsetime', 'cache_disk_read_count',
+        'cache_disk_hit', 'cache_disk_write_count',
+        'spindowncount', 'spinupcount', 'bufferoverflowcount',
+        'resp_p50', 'resp_p95', 'resp_p99', 'resp_p999',
+        'starttime', 'endtime', 'simulationtime', 'elapsedtime',
+        'totalrequestcount', 'disk_count', 'disk_avgresp', 'disk_hitratio',
+        'ts_window', 'ts_count', 'ts_avgresp', 'ts_maxresp', 'ts_hitratio',
+    )
 
     def __init__(self, path):
         self.path = path
         self.parse_file()
 
+    def to_dict(self):
+        '''
+        Return the parsed values as a dictionary which can be serialized
+        to JSON. from_dict() restores the object from it.
+        '''
+        d = self.__getstate__()
+        if 'energy' in d:
+            d['energy'] = self.energy.__getstate__()
+        if 'workload' in d:
+            d['workload'] = self.workload.__getstate__()
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        d = dict(d)
+        if 'energy' in d:
+            d['energy'] = Energy.from_state(d['energy'])
+        if 'workload' in d:
+            d['workload'] = WorkloadParam.from_state(d['workload'])
+        return cls.from_state(d)
+
     def parse_file(self):
         """
         Parse a simulation result file and set each result value to
-        this properties.
+        this properties. The missing and the malformed fields are
+        logged as warnings and their attributes are left unset. Raise
+        ValueError if a field of _REQUIRED_FIELDS is missing or
+        malformed.
         """
 
-        f = open(self.path, "r")
-        line = f.readline()
-        while line != '':
-            line = line.lower().strip()
-            if line.startswith("data disks  "):
-                self.numdatadisk = line.split()[3];
-            elif line.startswith("cache disks  "):
-                self.numcachedisk = line.split()[3];
-            elif line.startswith("replicas  "):
-                self.replicalevel = line.split()[2];
-            elif line.startswith("number of cache memories "):
-                self.nummemories = line.split()[5];
-            elif line.startswith("memory size"):
-                self.memsize = line.split()[4][0:-4].replace(',','')
-            elif line.startswith("block size  "):
-                self.blocksize = line.split()[3][0:-4].replace(',','')
-            elif line.startswith("cachememoryassignor"):
-                self.memoryassignor = line.split()[2]
-            elif line.startswith("cachememoryfactory"):
-                line = line.split()[2].split('.')
-                line = line[len(line)-1]
-                self.memoryfactory = line[0:line.find('region')]
-            elif line.startswith("storagemanagerfactory"):
-                line = line.split()[2].split('.')
-                line = line[len(line)-1]
-                self.storagemanagerfactory = line[0:line.find('storage')]
-            elif line.startswith("buffermanagerfactory"):
-                line = line.split()[2].split('.')
-                line = line[len(line)-1]
-                self.buffermanagerfactory = line[0:line.find('buffer')]
-            elif line.startswith("workload"):
-                line = line.split()[2].split('/')
-                line = line[len(line)-1]
-                self.workload = WorkloadParam(line.split('.'))
-            elif line.startswith("total energy"):
-                self.energy = Energy(f)
-            elif line.startswith("avg. response time"):
-                self.averageresponsetime = line.split(':')[1].strip().replace(',','')
-            elif line.startswith("total request count"):
-                self.setrequestcount(f)
-            elif line.startswith("cache memory read count"):
-                self.set_memory_access_count('read', line.split(':')[1])
-            elif line.startswith("cache memory write count"):
-                self.set_memory_access_count('write', line.split(':')[1])
-            elif line.startswith("avg. data disk response time"):
-                self.averagedatadiskresponsetime = line.split(':')[1].strip().replace(',','')
-            elif line.startswith("data disk access count"):
-                self.datadiskaccesscount = line.split(':')[1].strip().replace(',','')
-                self.datadiskreadcount = f.readline().split(':')[1].strip().replace(',','')
-                self.datadiskwritecount = f.readline().split(':')[1].strip().replace(',','')
-            elif line.startswith("avg. cache disk response time"):
-                self.averagecachediskresponsetime = line.split(':')[1].strip().replace(',','')
-            elif line.startswith("cache disk access count"):
-                self.set_cache_disk_access_count(f)
-            elif line.startswith("spindown count"):
-                self.spindowncount = line.split(':')[1].strip().replace(',','')
-            elif line.startswith("spinup   count"):
-                self.spinupcount = line.split(':')[1].strip().replace(',','')
-            elif line.startswith("buffer overflow count"):
-                self.bufferoverflowcount = line.split(':')[1].strip().replace(',','')
-            line = f.readline()
+        with open_file(self.path) as f:
+            text = f.read()
+
+        self.energy = Energy()
+        seen = set()
+        malformed = []
+        for label, value in _SUMMARY_LINE.findall(text):
+            label = _summary_label(label)
+            field = _SUMMARY_FIELDS.get(label)
+            if field is None or label in seen:
+                continue
+            seen.add(label)
+            attrs, convert = field
+            try:
+                values = convert(value.strip())
+            except ValueError:
+                malformed.append(label)
+                continue
+            if len(attrs) == 1:
+                values = (values,)
+            for attr, v in zip(attrs, values):
+                obj = self
+                if attr.startswith('energy.'):
+                    obj, attr = self.energy, attr[7:]
+                setattr(obj, attr, v)
+
+        # the factories of the x tick labels
+        for label, names in (
+                ('storagemanagerfactory', _STORAGE_MANAGER_NAME_TABLE),
+                ('buffermanagerfactory', _BUFFER_MANGER_TYPE)):
+            if label in seen and label not in malformed:
+                if getattr(self, label) not in names:
+                    malformed.append(label)
+
+        missing = sorted(set(_SUMMARY_FIELDS) - seen)
+        rejected = [label for label in _REQUIRED_FIELDS
+                    if label in missing or label in malformed]
+        if rejected:
+            raise ValueError('%s: missing or malformed fields: %s'
+                             % (self.path, ', '.join(rejected)))
+        if missing:
+            logging.warning('%s: missing fields: %s'
+                            % (self.path, ', '.join(missing)))
+        if malformed:
+            logging.warning('%s: malformed fields: %s'
+                            % (self.path, ', '.join(malformed)))
 
     def get_buffer_managerfactory_name(self):
         t = self.buffermanagerfactory.split('.')
@@ -154,149 +534,388 @@ class SimResult:
         bm = _BUFFER_MANGER_TYPE[self.buffermanagerfactory]
         return sm + '_' + bm
 
-    def setrequestcount(self, f):
-        ll = f.readline().lower().strip().split(':')[1]
-        self.readrequestcount = ll[:ll.find(',')]
-        ll = f.readline().lower().strip().split(':')[1]
-        self.writerequestcount = ll[:ll.find(',')]
-
-    def set_memory_access_count(self, attrname, l):
-        l = l.strip().replace(',','').replace(')','')
-        tmpl = l.split('(')
-        setattr(self, "memory_" + attrname + "_count", tmpl[0])
-        setattr(self, "memory_" + attrname + "_hit", tmpl[1])
-
-    def set_cache_disk_access_count(self, f):
-        l = f.readline().split(':')[1].strip().replace(',','').replace(')','')
-        tmpl = l.split('(')
-        self.cache_disk_read_count = tmpl[0]
-        self.cache_disk_hit = tmpl[1]
-        l = f.readline().split(':')[1].strip().replace(',','').replace(')','')
-        self.cache_disk_write_count = l.split('(')[0]
-
     def get_workload_param_text(self):
         return (
             "Hour:%d, ReadRatio:%.1f, DataSize:%s" % 
-            (int(self.workload.hour),
-             float(self.workload.readratio) / 10,
+            (self.workload.hour,
+             self.workload.readratio / 10.0,
              self.workload.datasize.upper()
              ))
                 
 
-class WorkloadParam:
+class WorkloadParam(_Record):
+
+    __slots__ = ('hour', 'readratio', 'arrivalrate', 'zipffactor', 'datasize')
 
     def __init__(self, args):
-        self.hour = args[1][:-1]
-        self.readratio = args[2][2:]
-        self.arrivalrate = args[3][3:]
-        self.zipffactor = args[4][3]
+        self.hour = int(args[1][:-1])
+        self.readratio = int(args[2][2:])
+        self.arrivalrate = int(args[3][3:])
+        self.zipffactor = int(args[4][3:])
         self.datasize = args[5][2:]
 
-class Energy:
+class Energy(_Record):
 
-    def __init__(self, f):
-        self._attrnames = ['active', 'idle', 'standby', 'spindown', 'spinup']
-        self._ENERGY_PREFIX = '_energy'
-        self._TOTALTIME_PREFIX = '_totaltime'
-        self._AVERAGETIME_PREFIX = '_averagetime'
+    __slots__ = tuple(
+        state + suffix
+        for state in _ENERGY_STATES
+        for suffix in ('_energy', '_totaltime', '_averagetime'))
 
-        self.get_energy_value(self._attrnames[0], f.readline().lower().strip())
-        self.get_energy_value(self._attrnames[1], f.readline().lower().strip())
-        self.get_energy_value(self._attrnames[2], f.readline().lower().strip())
-        self.get_energy_value(self._attrnames[3], f.readline().lower().strip())
-        self.get_energy_value(self._attrnames[4], f.readline().lower().strip())
+    def get_energy_value_list(self):
+        return [getattr(self, state + '_energy', 0.0)
+                for state in _ENERGY_STATES]
 
+    def get_total_energy_value(self):
+        return sum(self.get_energy_value_list())
 
-    def get_energy_value(self, attrname, line):
-        tmpl = line.split(':')[1].strip().split('(')
-        setattr(self, attrname + self._ENERGY_PREFIX, tmpl[0].replace(',',''))
-        setattr(self, attrname + self._TOTALTIME_PREFIX, tmpl[1].replace(',',''))
-        tmpl = line.split(':')[2].strip()[:-1]
-        setattr(self, attrname + self._AVERAGETIME_PREFIX, tmpl.replace(',',''))
 
-    def get_energy_value_list(self):
-        l = []
-        l.append(float(getattr(self, self._attrnames[0] + self._ENERGY_PREFIX, 0.0)))
-        l.append(float(getattr(self, self._attrnames[1] + self._ENERGY_PREFIX, 0.0)))
-        l.append(float(getattr(self, self._attrnames[2] + self._ENERGY_PREFIX, 0.0)))
-        l.append(float(getattr(self, self._attrnames[3] + self._ENERGY_PREFIX, 0.0)))
-        l.append(float(getattr(self, self._attrnames[4] + self._ENERGY_PREFIX, 0.0)))
-        return l
+def _get_column_value(sr, attr, default):
+    obj = sr
+    for name in attr.split('.'):
+        obj = getattr(obj, name, None)
+        if obj is None:
+            return default
+    return obj
 
-    def get_total_energy_value(self):
-        total_energy = float(getattr(self, self._attrnames[0] + self._ENERGY_PREFIX, 0.0))
-        total_energy += float(getattr(self, self._attrnames[1] + self._ENERGY_PREFIX, 0.0))
-        total_energy += float(getattr(self, self._attrnames[2] + self._ENERGY_PREFIX, 0.0))
-        total_energy += float(getattr(self, self._attrnames[3] + self._ENERGY_PREFIX, 0.0))
-        total_energy += float(getattr(self, self._attrnames[4] + self._ENERGY_PREFIX, 0.0))
 
-        return total_energy
-        
+def build_result_table(sim_results):
+    '''
+    Return the SimResult objects as a numpy structured array which has
+    one row per run and one field per column of _RESULT_COLUMNS. The rows
+    are sorted by the x tick labels and the labels are kept in the
+    'label' field. The missing values are 0 or an empty string. The
+    replicate runs of a configuration are aggregated into one row by
+    aggregate_replicates.
+    '''
+    with profile_stage('sort'):
+        sim_results = sort_sim_results(sim_results)
+    with profile_stage('table'):
+        return _build_result_table(sim_results)
 
-def plot_energy():
+
+def _build_result_table(sim_results):
     '''
-    x axis: buffer manager
-    y axis: disk status
+    Return the result table of build_result_table of the sorted SimResult
+    objects.
+    '''
+    labels = [sr.get_x_tick_label() for sr in sim_results]
+    columns = [('label', 'S', None)] + list(_RESULT_COLUMNS)
+
+    values = []
+    dtype = []
+    for name, kind, attr in columns:
+        if attr is None:
+            col = labels
+        elif kind == 'S':
+            col = [str(_get_column_value(sr, attr, '')) for sr in sim_results]
+        else:
+            col = [_get_column_value(sr, attr, 0) for sr in sim_results]
+        if kind == 'S':
+            kind = 'S%d' % max([1] + [len(v) for v in col])
+        values.append(col)
+        dtype.append((name, kind))
+
+    table = np.zeros(len(sim_results), dtype=dtype)
+    for (name, kind), col in zip(dtype, values):
+        table[name] = col
+    return aggregate_replicates(add_array_columns(table, sim_results))
+
+
+def add_array_columns(table, sim_results):
+    '''
+    Return the result table with the fields of _ARRAY_COLUMNS whose
+    values are the arrays of the sorted SimResult objects, that is the
+    per-disk values of load_disk_results indexed by the disk ids and the
+    per-window values of load_time_series. The fields of a group of
+    _ARRAY_COLUMNS are added only if any of the objects has them.
+    '''
+    columns = []
+    for group in _ARRAY_COLUMNS:
+        arrays = [[getattr(sr, name, None) for sr in sim_results]
+                  for name, kind, padding in group]
+        width = max([0] + [len(a) for col in arrays for a in col
+                           if a is not None])
+        if width > 0:
+            columns.extend((name, kind, padding, width, col)
+                           for (name, kind, padding), col in zip(group, arrays))
+    if not columns:
+        return table
+
+    descr = table.dtype.descr + [(name, kind, (width,))
+                                 for name, kind, padding, width, col in columns]
+    array_table = np.zeros(len(table), dtype=descr)
+    for name in table.dtype.names:
+        array_table[name] = table[name]
+    for name, kind, padding, width, col in columns:
+        array_table[name] = padding
+        for i, a in enumerate(col):
+            if a is not None:
+                array_table[name][i, :len(a)] = a
+    return array_table
+
+
+def get_t_quantiles(df):
+    '''
+    Return the 97.5% quantiles of Student's t distribution of the array of
+    the degrees of freedom, which are at least 1. The ones of more than 30
+    degrees of freedom are approximated by the expansion around the normal
+    distribution.
+    '''
+    df = np.asarray(df, dtype=float)
+    z = _Z_QUANTILE
+    quantiles = (z + (z ** 3 + z) / (4 * df)
+                 + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2))
+    table = np.array(_T_QUANTILES)
+    small = df <= len(table)
+    quantiles[small] = table[df[small].astype(int) - 1]
+    return quantiles
+
+
+def aggregate_replicates(table):
+    '''
+    Return the result table with one row per configuration, that is per
+    run name, when some runs of the table are the replicates of the same
+    configuration in different directories, e.g. one directory per random
+    seed. Otherwise the table is returned as it is.
+
+    The rows of a configuration are replaced by the first one of them with
+    the means of the metrics, and the sample standard deviations and the
+    half widths of the 95% confidence intervals of the means are added as
+    the <metric>_std and <metric>_ci fields, which are 0 for a single run.
+    The 'replicates' field is the number of the runs. The NaN values of
+    the arrays of add_array_columns are left out of the statistics. The
+    replicates which read the same disk traces of get_trace_dir have the
+    same values of them, so the deviations of the columns of the traces
+    are NaN for them, and no error bars are drawn.
+    '''
+    names = [get_run_name(_export_value(p)) for p in table['path'].tolist()]
+    if len(set(names)) == len(names):
+        return table
+
+    # the rows of a configuration are made adjacent without changing the
+    # order of the labels
+    order = np.lexsort((names, table['label']))
+    table = table[order]
+    names = np.array(names)[order]
+    starts = np.flatnonzero(np.append(True, names[1:] != names[:-1]))
+    counts = np.diff(np.append(starts, len(table)))
+
+    metrics = [name for name in table.dtype.names
+               if table.dtype[name].base.kind in 'iuf'
+               and name not in _CONFIG_COLUMNS]
+    shapes = [table.dtype[name].shape for name in metrics]
+    # all the metrics are the columns of one matrix, which is reduced per
+    # configuration at once
+    matrix = np.hstack([table[name].reshape(len(table), -1).astype(float)
+                        for name in metrics])
+    valid = np.isfinite(matrix)
+    n = np.add.reduceat(valid.astype(float), starts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.add.reduceat(np.where(valid, matrix, 0.0), starts) / n
+        deviations = np.where(valid, matrix - np.repeat(mean, counts, axis=0),
+                              0.0)
+        std = np.sqrt(np.add.reduceat(deviations ** 2, starts) / (n - 1))
+        ci = get_t_quantiles(np.maximum(n - 1, 1)) * std / np.sqrt(n)
+    std[n < 2] = 0
+    ci[n < 2] = 0
+    if _trace_dir:
+        trace_dirs = [get_trace_dir(_export_value(p))
+                      for p in table['path'].tolist()]
+        shared = np.array([len(set(trace_dirs[s:s + c])) < c
+                           for s, c in zip(starts, counts)])
+        columns = np.hstack([
+            np.repeat(name.startswith(_TRACE_COLUMN_PREFIXES),
+                      int(np.prod(shape)))
+            for name, shape in zip(metrics, shapes)])
+        std[np.ix_(shared, columns)] = np.nan
+        ci[np.ix_(shared, columns)] = np.nan
+
+    descr = []
+    for name in table.dtype.names:
+        kind = 'f8' if name in metrics else table.dtype[name].base.str
+        descr.append((name, kind, table.dtype[name].shape))
+    descr.append(('replicates', 'i4', ()))
+    for suffix in ('_std', '_ci'):
+        descr.extend((name + suffix, 'f8', shape)
+                     for name, shape in zip(metrics, shapes))
+    aggregated = np.zeros(len(starts), dtype=descr)
+    for name in table.dtype.names:
+        aggregated[name] = table[name][starts]
+    aggregated['replicates'] = counts
+    i = 0
+    for name, shape in zip(metrics, shapes):
+        width = int(np.prod(shape))
+        for suffix, values in (('', mean), ('_std', std), ('_ci', ci)):
+            aggregated[name + suffix] = values[:, i:i + width].reshape(
+                (len(starts),) + shape)
+        i += width
+    return aggregated
+
+
+def get_errors(table, name):
     '''
+    Return the half widths of the confidence intervals of the column of
+    the result table for the error bars, or None if the runs of the table
+    have no replicates.
+    '''
+    if name + '_ci' not in table.dtype.names:
+        return None
+    return table[name + '_ci']
+
+
+def get_x_tick_labels(table):
+    '''
+    Return the x tick labels of the rows of the result table, with the
+    number of the replicate runs of the rows which have more than one.
+    '''
+    if 'replicates' not in table.dtype.names:
+        return table['label']
+    return ['%s\nn=%d' % (_export_value(label), n) if n > 1
+            else _export_value(label)
+            for label, n in zip(table['label'], table['replicates'])]
+
+
+def build_export_table(sim_results):
+    '''
+    Return the result table of build_result_table with the path_filter
+    parameters of the runs after the path, except the ones which are
+    already in the table. The parameters whose values are all digits are
+    integers, and the others are strings.
+    '''
+    with profile_stage('sort'):
+        sim_results = sort_sim_results(sim_results)
+    with profile_stage('table'):
+        table = _build_result_table(sim_results)
+        params = [
+            path_filter.match(get_run_name(_export_value(p))).groupdict()
+            for p in table['path'].tolist()]
+
+        columns = []
+        for param in get_filter_params():
+            if param in table.dtype.names:
+                continue
+            col = [d[param] for d in params]
+            if col and all(v.isdigit() for v in col):
+                columns.append((param, 'i8', col))
+            else:
+                width = max([1] + [len(v) for v in col])
+                columns.append((param, 'S%d' % width, col))
+
+        i = table.dtype.names.index('path') + 1
+        descr = (table.dtype.descr[:i]
+                 + [(name, kind) for name, kind, col in columns]
+                 + table.dtype.descr[i:])
+        export = np.zeros(len(table), dtype=descr)
+        for name in table.dtype.names:
+            export[name] = table[name]
+        for name, kind, col in columns:
+            export[name] = col
+    return export
+
+
+def _export_value(v):
+    if isinstance(v, bytes) and not isinstance(v, str):
+        return v.decode('ascii')
+    return v
+
+
+def export_sim_results(objs, path):
+    '''
+    Write the table of build_export_table to the path in the format of
+    its extension, which is one of _EXPORT_FORMATS.
+    '''
+    fmt = os.path.splitext(path)[1][1:].lower()
+    if fmt not in _EXPORT_FORMATS:
+        raise ValueError('unknown export format: ' + path)
+    table = build_export_table(objs)
+    with open(path, 'wb' if fmt == 'npy' else 'w') as f:
+        write_export_table(f, table, fmt)
+    logging.info('exported %d results to %s' % (len(table), path))
 
-    active_l = []
-    idle_l = []
-    standby_l = []
-    spinup_l = []
-    spindown_l = []
 
-    x_ticks = []
+def write_export_table(f, table, fmt):
+    '''
+    Write the table of build_export_table to the file object in fmt,
+    which is one of _EXPORT_FORMATS.
+    '''
+    if fmt == 'npy':
+        np.save(f, table)
+        return
+
+    # the arrays of add_array_columns are only in NPY
+    names = [name for name in table.dtype.names if not table.dtype[name].shape]
+    columns = [table.dtype.names.index(name) for name in names]
+    rows = [[_export_value(row[i]) for i in columns] for row in table.tolist()]
+    if fmt == 'csv':
+        writer = csv.writer(f)
+        writer.writerow(names)
+        writer.writerows(rows)
+    else:
+        json.dump([dict(zip(names, row)) for row in rows], f, indent=1,
+                  sort_keys=True)
+
+
+def get_title_text(table):
+    row = table[0]
+    return ('Replevel=%d, CMA=%s, CMF=%s\n'
+            'Hour:%d, ReadRatio:%.1f, DataSize:%s'
+            % (row['replicalevel'], row['memoryassignor'],
+               row['memoryfactory'], row['wl_hour'],
+               row['wl_readratio'] / 10.0, row['wl_datasize'].upper()))
+
+
+def plot_energy(fig, table, ax=None):
+    '''
+    x axis: buffer manager
+    y axis: disk status
+    '''
 
-    for sr in sort_sim_results(_sim_results.values()):
-        x_ticks.append(sr.get_x_tick_label())
-        ene_val = sr.energy.get_energy_value_list()
-        active_l.append(float(ene_val[0]))
-        idle_l.append(float(ene_val[1]))
-        standby_l.append(float(ene_val[2]))
-        spinup_l.append(float(ene_val[3]))
-        spindown_l.append(float(ene_val[4]))
+    x_ticks = get_x_tick_labels(table)
+    active_l = table['active_energy']
+    idle_l = table['idle_energy']
+    standby_l = table['standby_energy']
+    spinup_l = table['spinup_energy']
+    spindown_l = table['spindown_energy']
 
     width = 0.50
     ind = np.arange(len(x_ticks))
     ind = ind + 0.5 - width / 2
 
-    bottoms = np.array([0 for i in range(len(x_ticks))])
-
-    # clear figure
-    plt.clf()
+    bottoms = np.zeros(len(x_ticks))
 
     # setting layout
-    gs = GridSpec(1,1)
-    gs.update(left=0.15, right=0.80)
-    ax = plt.subplot(gs[:])
+    standalone = ax is None
+    if standalone:
+        fig.subplots_adjust(left=0.15, right=0.80)
+        ax = fig.add_subplot(111)
 
-    p_active = plt.bar(ind, active_l, width, color='r', label='active', axes=ax)
+    def bar(values, color, state):
+        return ax.bar(ind, values, width, color=color, bottom=bottoms,
+                      label=state, yerr=get_errors(table, state + '_energy'),
+                      error_kw=_ERROR_KW)
+
+    p_active = bar(active_l, 'r', 'active')
     bottoms = bottoms + active_l
-    p_idle = plt.bar(ind, idle_l, width, color='g', bottom=bottoms, label='idle', axes=ax)
+    p_idle = bar(idle_l, 'g', 'idle')
     bottoms = bottoms + idle_l
-    p_standby = plt.bar(ind, standby_l, width, color='b', bottom=bottoms, label='standby', axes=ax)
+    p_standby = bar(standby_l, 'b', 'standby')
     bottoms = bottoms + standby_l
-    p_spindown = plt.bar(ind, spindown_l, width, color='c', bottom=bottoms, label='spindown', axes=ax)
+    p_spindown = bar(spindown_l, 'c', 'spindown')
     bottoms = bottoms + spindown_l
-    p_spinup = plt.bar(ind, spinup_l, width, color='m', bottom=bottoms, label='spinup', axes=ax)
+    p_spinup = bar(spinup_l, 'm', 'spinup')
 
     # labels setting
-    plt.ylabel('Energy Consumption [joule]', size=14)
-    plt.yticks(size=16)
-    plt.xticks(ind + width / 2, x_ticks)
+    ax.set_ylabel('Energy Consumption [joule]', size=14)
+    ax.tick_params(axis='y', labelsize=16)
+    ax.set_xticks(ind + width / 2)
+    ax.set_xticklabels(x_ticks)
 
     # title setting
-    plt.title('Replevel=%s, CMA=%s, CMF=%s\n%s'
-              % (_sim_results.values()[0].replicalevel, 
-                 _sim_results.values()[0].memoryassignor,
-                 _sim_results.values()[0].memoryfactory,
-                 _sim_results.values()[0].get_workload_param_text()
-                 ),
-              size=16
-    )
+    if standalone:
+        ax.set_title(get_title_text(table), size=16)
 
     # legend setting 
-    plt.legend(
+    ax.legend(
         (p_spinup[0], p_spindown[0], p_standby[0], p_idle[0], p_active[0]),
         ('spinup', 'spindown', 'standby', 'idle', 'active'),
         bbox_to_anchor=(1, 1),
@@ -304,265 +923,196 @@ def plot_energy():
         loc='upper left',
     )
 
-        
     # set x ticks to the scientific notation
-    plt.gca().ticklabel_format(style="sci", scilimits=(0,0), axis="y", size=16)
-    
-    # plt.show()
-    save_figure(plt, 'energy', _output_dir)
-
+    ax.ticklabel_format(style="sci", scilimits=(0,0), axis="y")
 
 
-def plot_response():
+def plot_response(fig, table, ax=None):
     '''
     x axis: buffer manager
     y axis: average response time
     '''
 
-    x_ticks = []
-    resp_time = []
-    
-    # for sr in _sim_results.iteritems():
-    #     x_ticks.append(sr[1].get_x_tick_label())
-    #     resp_time.append(float(sr[1].averageresponsetime))
-    for sr in sort_sim_results(_sim_results.values()):
-        x_ticks.append(sr.get_x_tick_label())
-        resp_time.append(float(sr.averageresponsetime))
-        
+    x_ticks = get_x_tick_labels(table)
+    resp_time = table['averageresponsetime']
 
     width = 0.25
     ind = np.arange(len(x_ticks))
     ind = ind + 0.5 - width / 2
 
-    # clear figure
-    plt.clf()
-
-    # plt.bar(ind, resp_time, width, color='b', axes=ax)
-    plt.bar(ind, resp_time, width, color='b')
+    standalone = ax is None
+    if standalone:
+        ax = fig.add_subplot(111)
+    ax.bar(ind, resp_time, width, color='b',
+           yerr=get_errors(table, 'averageresponsetime'), error_kw=_ERROR_KW)
 
     # labels setting
-    plt.ylabel('Avg. Response Time [s]', size=14)
-    plt.yticks(size=16)
-    plt.xticks(ind + width / 2, x_ticks)
+    ax.set_ylabel('Avg. Response Time [s]', size=14)
+    ax.tick_params(axis='y', labelsize=16)
+    ax.set_xticks(ind + width / 2)
+    ax.set_xticklabels(x_ticks)
 
     # title setting
-    plt.title('Replevel=%s, CMA=%s, CMF=%s\n%s'
-              % (_sim_results.values()[0].replicalevel, 
-                 _sim_results.values()[0].memoryassignor,
-                 _sim_results.values()[0].memoryfactory,
-                 _sim_results.values()[0].get_workload_param_text()
-                 ),
-              size=16
-    )
-    
-    # plt.show()
-    save_figure(plt, 'avg_response', _output_dir)
+    if standalone:
+        ax.set_title(get_title_text(table), size=16)
 
 
-def plot_overflow():
+def plot_overflow(fig, table, ax=None):
     '''
     x axis: buffer manager
     y axis: buffer overflow count
     '''
 
-    x_ticks = []
-    overflow = []
-
-    # for sr in _sim_results.iteritems():
-    #     x_ticks.append(sr[1].get_x_tick_label())
-    #     overflow.append(int(sr[1].bufferoverflowcount))
-    for sr in sort_sim_results(_sim_results.values()):
-        x_ticks.append(sr.get_x_tick_label())
-        overflow.append(int(sr.bufferoverflowcount))
-
+    x_ticks = get_x_tick_labels(table)
+    overflow = table['bufferoverflowcount']
 
     width = 0.30
     ind = np.arange(len(x_ticks))
     ind = ind + 0.5 - width / 2
 
-    # clear figure
-    plt.clf()
-
-    plt.bar(ind, overflow, width, color='b')
+    standalone = ax is None
+    if standalone:
+        ax = fig.add_subplot(111)
+    ax.bar(ind, overflow, width, color='b',
+           yerr=get_errors(table, 'bufferoverflowcount'), error_kw=_ERROR_KW)
 
     # labels setting
-    plt.ylabel('Overflow Count', size=14)
-    plt.yticks(size=16)
-    plt.xticks(ind + width / 2, x_ticks)
+    ax.set_ylabel('Overflow Count', size=14)
+    ax.tick_params(axis='y', labelsize=16)
+    ax.set_xticks(ind + width / 2)
+    ax.set_xticklabels(x_ticks)
 
     # title setting
-    plt.title('Replevel=%s, CMA=%s, CMF=%s\n%s'
-              % (_sim_results.values()[0].replicalevel, 
-                 _sim_results.values()[0].memoryassignor,
-                 _sim_results.values()[0].memoryfactory,
-                 _sim_results.values()[0].get_workload_param_text()
-                 ),
-              size=16
-    )
-    
-    # plt.show()
-    save_figure(plt, 'overflow', _output_dir)
+    if standalone:
+        ax.set_title(get_title_text(table), size=16)
 
 
-def plot_spin():
+def plot_spin(fig, table, ax=None):
     '''
     x axis: buffer manager
     y axis: cache hit ration (memory and disk)
     '''
-    x_ticks = []
-    
-    spindowns = []
-    spinups = []
-
-    # for sr in _sim_results.iteritems():
-    #     x_ticks.append(sr[1].get_x_tick_label())
-    #     spindowns.append(int(sr[1].spindowncount))
-    #     spinups.append(int(sr[1].spinupcount))
-    for sr in sort_sim_results(_sim_results.values()):
-        x_ticks.append(sr.get_x_tick_label())
-        spindowns.append(int(sr.spindowncount))
-        spinups.append(int(sr.spinupcount))
-    
+    x_ticks = get_x_tick_labels(table)
+    spindowns = table['spindowncount']
+    spinups = table['spinupcount']
+
     width = 0.30
     ind = np.arange(len(x_ticks))
     ind = ind + 0.5 - width
 
-    # clear figure
-    plt.clf()
+    standalone = ax is None
+    if standalone:
+        ax = fig.add_subplot(111)
+    ax_down = ax.bar(ind, spindowns, width, color='b',
+                     yerr=get_errors(table, 'spindowncount'),
+                     error_kw=_ERROR_KW)
+    ax_up = ax.bar(ind+width, spinups, width, color='r',
+                   yerr=get_errors(table, 'spinupcount'), error_kw=_ERROR_KW)
 
-    ax_down = plt.bar(ind, spindowns, width, color='b')
-    ax_up = plt.bar(ind+width, spinups, width, color='r')
-    
     # labels setting
-    plt.ylabel('Spinup/down Count', size=14)
-    plt.yticks(size=16)
-    plt.xticks(ind + 2 * width / 2, x_ticks)
+    ax.set_ylabel('Spinup/down Count', size=14)
+    ax.tick_params(axis='y', labelsize=16)
+    ax.set_xticks(ind + 2 * width / 2)
+    ax.set_xticklabels(x_ticks)
 
     # title setting
-    plt.title('Replevel=%s, CMA=%s, CMF=%s\n%s'
-              % (_sim_results.values()[0].replicalevel, 
-                 _sim_results.values()[0].memoryassignor,
-                 _sim_results.values()[0].memoryfactory,
-                 _sim_results.values()[0].get_workload_param_text()
-                 ),
-              size=16
-    )
+    if standalone:
+        ax.set_title(get_title_text(table), size=16)
 
     # legend setting 
-    plt.legend(
+    ax.legend(
         (ax_down[0], ax_up[0]),
         ('spindown', 'spinup'),
         # bbox_to_anchor=(1, 1),
         loc='upper right',
     )
-     
-    # plt.show()
-    save_figure(plt, 'spindownup', _output_dir)
 
 
-def plot_hit():
+def plot_hit(fig, table, ax=None):
     '''
     x axis: buffer manager
     y axis: cache hit ration (memory and disk)
     '''
 
-    x_ticks = []
-    mem_hit = []
-    disk_hit = []
-
-    for sr in sort_sim_results(_sim_results.values()):
-        x_ticks.append(sr.get_x_tick_label())
-        mem_hit.append(float(sr.memory_read_hit))
-        disk_hit.append(float(sr.cache_disk_hit))
+    x_ticks = get_x_tick_labels(table)
+    mem_hit = table['memory_read_hit']
+    disk_hit = table['cache_disk_hit']
 
     width = 0.30
     ind = np.arange(len(x_ticks))
     ind = ind + 0.5 - width
 
-    # clear figure
-    plt.clf()
-
-    ax_mem_hit = plt.bar(ind, mem_hit, width, color='b')
-    ax_disk_hit = plt.bar(ind+width, disk_hit, width, color='r')
+    standalone = ax is None
+    if standalone:
+        ax = fig.add_subplot(111)
+    ax_mem_hit = ax.bar(ind, mem_hit, width, color='b',
+                        yerr=get_errors(table, 'memory_read_hit'),
+                        error_kw=_ERROR_KW)
+    ax_disk_hit = ax.bar(ind+width, disk_hit, width, color='r',
+                         yerr=get_errors(table, 'cache_disk_hit'),
+                         error_kw=_ERROR_KW)
 
     # labels setting
-    plt.ylabel('Cache Hit Ratio', size=14)
-    plt.xticks(ind + 2 * width / 2, x_ticks, size=14)
-    plt.yticks(np.arange(0, 1.01, 0.25), size=16)
+    ax.set_ylabel('Cache Hit Ratio', size=14)
+    ax.set_xticks(ind + 2 * width / 2)
+    ax.set_xticklabels(x_ticks, size=14)
+    ax.set_yticks(np.arange(0, 1.01, 0.25))
+    ax.tick_params(axis='y', labelsize=16)
 
     # title setting
-    plt.title('Replevel=%s, CMA=%s, CMF=%s\n%s'
-              % (_sim_results.values()[0].replicalevel, 
-                 _sim_results.values()[0].memoryassignor,
-                 _sim_results.values()[0].memoryfactory,
-                 _sim_results.values()[0].get_workload_param_text()
-                 ),
-              size=16
-    )
+    if standalone:
+        ax.set_title(get_title_text(table), size=16)
 
     # legend setting 
-    plt.legend(
+    ax.legend(
         (ax_mem_hit[0], ax_disk_hit[0]),
         ('mem hit', 'disk hit'),
         # bbox_to_anchor=(1, 1),
         loc='upper right',
     )
-     
-    # plt.show()
-    save_figure(plt, 'cache_hit', _output_dir)
 
 
-def plot_statetime():
+def plot_statetime(fig, table, ax=None):
     '''
     x axis: buffer manager
     y axis: cache hit ration (memory and disk)
     '''
     
-    x_ticks = []
-    active_t = []
-    idle_t = []
-    standby_t = []
-    spindown_t = []
-    spinup_t = []
-
-    for sr in sort_sim_results(_sim_results.values()):
-        x_ticks.append(sr.get_x_tick_label())
-        active_t.append(float(sr.energy.active_totaltime))
-        idle_t.append(float(sr.energy.idle_totaltime))
-        standby_t.append(float(sr.energy.standby_totaltime))
-        spindown_t.append(float(sr.energy.spindown_totaltime))
-        spinup_t.append(float(sr.energy.spinup_totaltime))
+    x_ticks = get_x_tick_labels(table)
+    active_t = table['active_totaltime']
+    idle_t = table['idle_totaltime']
+    standby_t = table['standby_totaltime']
+    spindown_t = table['spindown_totaltime']
+    spinup_t = table['spinup_totaltime']
 
     width = 1.0 / 6
     ind = np.arange(len(x_ticks))
     ind = ind + 0.5 - (5.0 * width / 2)
 
-    # clear figure
-    plt.clf()
-
-    ax_active = plt.bar(ind, active_t, width, color='r')
-    ax_idle = plt.bar(ind + width, idle_t, width, color='g')
-    ax_standby = plt.bar(ind + 2 * width, standby_t, width, color='b')
-    ax_spindown = plt.bar(ind + 3 * width, spindown_t, width, color='c')
-    ax_spinup = plt.bar(ind + 4 * width, spinup_t, width, color='m')
+    standalone = ax is None
+    if standalone:
+        ax = fig.add_subplot(111)
+    ax_active, ax_idle, ax_standby, ax_spindown, ax_spinup = [
+        ax.bar(ind + i * width, values, width, color=c,
+               yerr=get_errors(table, state + '_totaltime'),
+               error_kw=_ERROR_KW)
+        for i, (state, values, c) in enumerate(zip(
+            ('active', 'idle', 'standby', 'spindown', 'spinup'),
+            (active_t, idle_t, standby_t, spindown_t, spinup_t),
+            ('r', 'g', 'b', 'c', 'm')))]
 
     # labels setting
-    plt.ylabel('Total Time of Each State  [s]', size=14)
-    plt.xticks(ind + 5 * width / 2, x_ticks, size=14)
-    plt.yticks(size=16)
+    ax.set_ylabel('Total Time of Each State  [s]', size=14)
+    ax.set_xticks(ind + 5 * width / 2)
+    ax.set_xticklabels(x_ticks, size=14)
+    ax.tick_params(axis='y', labelsize=16)
 
     # title setting
-    plt.title('Replevel=%s, CMA=%s, CMF=%s\n%s'
-              % (_sim_results.values()[0].replicalevel, 
-                 _sim_results.values()[0].memoryassignor,
-                 _sim_results.values()[0].memoryfactory,
-                 _sim_results.values()[0].get_workload_param_text()
-                 ),
-              size=16
-    )
+    if standalone:
+        ax.set_title(get_title_text(table), size=16)
 
     # legend setting 
-    plt.legend(
+    ax.legend(
         (ax_active[0], ax_idle[0], ax_standby[0], ax_spindown[0], ax_spinup[0]),
         ('active', 'idle', 'standby', 'spindown', 'spinup'),
         bbox_to_anchor=(0.85, 1),
@@ -570,69 +1120,862 @@ def plot_statetime():
     )
 
     # set x ticks to the scientific notation
-    plt.gca().ticklabel_format(style="sci", scilimits=(0,0), axis="y")
-     
-    # plt.show()
-    save_figure(plt, 'state_time', _output_dir)
+    ax.ticklabel_format(style="sci", scilimits=(0,0), axis="y")
 
 
-def save_figure(plt, name, parent='.'):
-    if not os.path.exists(parent):
-        os.mkdir(parent)
-    parent = get_output_dirname()
-    if not os.path.exists(parent):
-        os.mkdir(parent)
-    path = os.path.join(parent, name)
-    for sufix in _file_formats:
-        plt.savefig(path + '.' + sufix)
+def plot_tail(fig, table):
+    '''
+    x axis: buffer manager
+    y axis: percentiles of the response time of the disk accesses
+    '''
+
+    x_ticks = get_x_tick_labels(table)
+    names = ('p50', 'p95', 'p99', 'p999')
+    colors = ('b', 'g', 'y', 'r')
+
+    width = 1.0 / 5
+    ind = np.arange(len(x_ticks))
+    ind = ind + 0.5 - (4.0 * width / 2)
+
+    ax = fig.add_subplot(111)
+    bars = [ax.bar(ind + i * width, table['resp_' + name], width, color=c,
+                   yerr=get_errors(table, 'resp_' + name), error_kw=_ERROR_KW)
+            for i, (name, c) in enumerate(zip(names, colors))]
+    ax.set_yscale('log', nonposy='clip')
+
+    # labels setting
+    ax.set_ylabel('Disk Response Time [s]', size=14)
+    ax.set_xticks(ind + 4 * width / 2)
+    ax.set_xticklabels(x_ticks, size=14)
+    ax.tick_params(axis='y', labelsize=16)
+
+    # title setting
+    ax.set_title(get_title_text(table), size=16)
+
+    # legend setting 
+    ax.legend(
+        [b[0] for b in bars],
+        ('p50', 'p95', 'p99', 'p99.9'),
+        loc='upper left',
+    )
+
+
+def plot_dashboard(fig, table):
+    '''
+    Plot the graphs of _DASHBOARD_PLOTS as the panels of one figure. The
+    runs are in the same order in all the panels and their x tick labels
+    are drawn only under the bottom panel.
+    '''
+    fig.set_size_inches(12, 3 * len(_DASHBOARD_PLOTS))
+    fig.subplots_adjust(left=0.08, right=0.85, top=0.95, bottom=0.05,
+                        hspace=0.15)
+    fig.suptitle(get_title_text(table), size=16)
+
+    for i, plot in enumerate(_DASHBOARD_PLOTS):
+        ax = fig.add_subplot(len(_DASHBOARD_PLOTS), 1, i + 1)
+        _PLOTTERS[plot](fig, table, ax)
+        ax.yaxis.label.set_size(10)
+        ax.tick_params(axis='y', labelsize=10)
+        ax.set_xlim(0, len(table))
+        if i < len(_DASHBOARD_PLOTS) - 1:
+            for label in ax.get_xticklabels():
+                label.set_visible(False)
+
+
+def plot_timeseries(fig, table):
+    '''
+    x axis: time of the simulation
+    y axis: accesses per second, average and maximum response times of
+            the disk accesses and rotation hit ratio in every window
+    The confidence intervals of the replicate runs are shaded.
+    '''
+    if 'ts_count' not in table.dtype.names:
+        logging.warning('no disk traces for the timeseries plot')
+        return
+
+    window = table['ts_window'].max()
+    # the steps are drawn from the starts of the windows to the end of the
+    # last window
+    times = np.arange(table['ts_count'].shape[1] + 1) * window
+    panels = (
+        (table['ts_count'] / window, 'ts_count', window, 'Accesses [1/s]'),
+        (table['ts_avgresp'], 'ts_avgresp', 1, 'Avg. Response [s]'),
+        (table['ts_maxresp'], 'ts_maxresp', 1, 'Max. Response [s]'),
+        (table['ts_hitratio'], 'ts_hitratio', 1, 'Rotation Hit Ratio'),
+    )
+    labels = [label.replace('\n', ' ') for label in get_x_tick_labels(table)]
+
+    fig.set_size_inches(12, 3 * len(panels))
+    fig.subplots_adjust(left=0.08, right=0.95, top=0.93, bottom=0.05,
+                        hspace=0.15)
+    fig.suptitle(get_title_text(table) + ' (window: %gs)' % window, size=16)
+    for i, (values, column, scale, name) in enumerate(panels):
+        ax = fig.add_subplot(len(panels), 1, i + 1)
+        errors = get_errors(table, column)
+        for j, (label, row) in enumerate(zip(labels, values)):
+            row = np.append(row, row[-1])
+            line, = ax.plot(times, row, drawstyle='steps-post',
+                            linewidth=0.8, label=label)
+            if errors is not None:
+                error = np.append(errors[j], errors[j][-1]) / scale
+                ax.fill_between(times, row - error, row + error, step='post',
+                                color=line.get_color(), alpha=0.2,
+                                linewidth=0)
+        ax.set_ylabel(name, size=10)
+        ax.set_xlim(0, times[-1])
+        if i < len(panels) - 1:
+            for label in ax.get_xticklabels():
+                label.set_visible(False)
+        else:
+            ax.set_xlabel('Time [s]', size=12)
+    fig.axes[0].legend(loc='upper right', fontsize=8)
+
+
+def plot_heatmap(fig, table):
+    '''
+    x axis: disk id
+    y axis: run
+    color: accesses relative to the mean of the accessed disks of the
+           run, average response time and rotation hit ratio of the disks
+    '''
+    if 'disk_count' not in table.dtype.names:
+        logging.warning('no disk traces for the heatmap plot')
+        return
+
+    # the arrays of the runs with fewer disks are padded with 0, so the
+    # disks without accesses are not in the means
+    counts = np.ma.masked_equal(table['disk_count'].astype(float), 0)
+    load = counts / counts.mean(axis=1)[:, np.newaxis]
+    panels = (
+        (load, 'Accesses / Mean of Run', 'YlOrRd'),
+        (np.ma.masked_where(counts.mask, table['disk_avgresp']),
+         'Average Response Time [s]', 'viridis'),
+        (np.ma.masked_invalid(table['disk_hitratio']),
+         'Rotation Hit Ratio', 'viridis'),
+    )
+    # the cells of the replicate runs are their means, and the numbers of
+    # the runs are in the labels
+    labels = ['%s (%.2f)' % (label.replace('\n', ' '), m)
+              for label, m in zip(get_x_tick_labels(table),
+                                  load.max(axis=1).filled(0))]
+
+    fig.set_size_inches(12, 3 * len(panels) + 0.2 * len(table))
+    fig.subplots_adjust(left=0.15, right=0.95, top=0.93, bottom=0.05,
+                        hspace=0.3)
+    fig.suptitle(get_title_text(table), size=16)
+    for i, (values, name, cmap) in enumerate(panels):
+        ax = fig.add_subplot(len(panels), 1, i + 1)
+        image = ax.imshow(values, aspect='auto', interpolation='nearest',
+                          cmap=cmap)
+        fig.colorbar(image, ax=ax).set_label(name, size=10)
+        ax.set_yticks(np.arange(len(table)))
+        ax.set_yticklabels(labels, size=8)
+        if i == len(panels) - 1:
+            ax.set_xlabel('Disk ID', size=12)
+
+
+def get_throughput(table):
+    '''
+    Return the simulated seconds, the requests and the data disk accesses
+    per wall clock second of the runs of the result table. The runs
+    without the elapsed time are 0.
+    '''
+    elapsed = table['elapsedtime']
+    valid = elapsed > 0
+    rates = []
+    for name in ('simulationtime', 'totalrequestcount', 'datadiskaccesscount'):
+        rate = np.zeros(len(table))
+        rate[valid] = table[name][valid] / elapsed[valid]
+        rates.append(rate)
+    return tuple(rates)
+
+
+def get_throughput_errors(table):
+    '''
+    Return the half widths of the confidence intervals of the speeds of
+    get_throughput, or None if the runs of the table have no replicates.
+    The speeds are the ratios of the means, so the relative errors of the
+    two means are added in quadrature.
+    '''
+    if get_errors(table, 'elapsedtime') is None:
+        return None
+    elapsed = table['elapsedtime']
+    valid = elapsed > 0
+    relative = np.zeros(len(table))
+    relative[valid] = (table['elapsedtime_ci'][valid] / elapsed[valid]) ** 2
+    errors = []
+    for name, rate in zip(('simulationtime', 'totalrequestcount',
+                           'datadiskaccesscount'), get_throughput(table)):
+        values = table[name]
+        error = np.zeros(len(table))
+        rows = valid & (values > 0)
+        error[rows] = rate[rows] * np.sqrt(
+            relative[rows] + (table[name + '_ci'][rows] / values[rows]) ** 2)
+        errors.append(error)
+    return tuple(errors)
+
+
+def plot_throughput(fig, table):
+    '''
+    x axis: buffer manager
+    y axis: simulated seconds, requests and data disk accesses per wall
+            clock second of the simulator
+    '''
+
+    x_ticks = get_x_tick_labels(table)
+    labels = ('Sim. Time / Wall Time', 'Requests / s', 'Data Disk Access / s')
+    colors = ('b', 'g', 'r')
+
+    width = 0.5
+    ind = np.arange(len(x_ticks))
+    ind = ind + 0.5 - width / 2
+
+    rates = get_throughput(table)
+    errors = get_throughput_errors(table) or (None,) * len(rates)
+    for i, (rate, error, label, c) in enumerate(zip(rates, errors, labels,
+                                                    colors)):
+        ax = fig.add_subplot(3, 1, i + 1)
+        ax.bar(ind, rate, width, color=c, yerr=error, error_kw=_ERROR_KW)
+
+        # labels setting
+        ax.set_ylabel(label, size=10)
+        ax.tick_params(axis='y', labelsize=10)
+        ax.set_xticks(ind + width / 2)
+        if i == len(rates) - 1:
+            ax.set_xticklabels(x_ticks)
+        else:
+            ax.set_xticklabels([])
+
+        # title setting
+        if i == 0:
+            ax.set_title(get_title_text(table), size=16)
+
+
+def format_throughput_report(table):
+    '''
+    Return the lines of the table of the average speeds of the simulator
+    and the total elapsed time of the runs for every value of the columns
+    of _THROUGHPUT_KEYS, and of all the runs. The rows of the replicate
+    runs are weighted by the numbers of the runs.
+    '''
+    rates = get_throughput(table)
+    elapsed = table['elapsedtime']
+    valid = elapsed > 0
+    runs = np.ones(len(table), dtype=int)
+    if 'replicates' in table.dtype.names:
+        runs = table['replicates']
+
+    def format_row(key, value, rows):
+        rows = rows & valid
+        return ('%-22s %-26s %6d %12.2f %12.1f %14.1f %10.2f'
+                % ((key, value, runs[rows].sum())
+                   + tuple(np.average(rate[rows], weights=runs[rows])
+                           for rate in rates)
+                   + ((elapsed * runs)[rows].sum() / 3600.0,)))
+
+    if not valid.any():
+        return ['no runs with the elapsed time']
+    lines = ['%-22s %-26s %6s %12s %12s %14s %10s'
+             % ('key', 'value', 'runs', 'simtime/s', 'requests/s',
+                'dd access/s', 'elapsed[h]')]
+    for key in _THROUGHPUT_KEYS:
+        for value in np.unique(table[key][valid]):
+            lines.append(format_row(key, _export_value(value),
+                                    table[key] == value))
+    lines.append(format_row('all', '', valid))
+    return lines
+
+
+def render_figure(task):
+    '''
+    Draw a graph on a new figure and save it in one file format. The task
+    is a tuple of the plot type, the result table, the output directory
+    and the file format. This is called by the worker processes, so it
+    does not use the pyplot state. Return the plot type and the wall and
+    CPU times of the rendering.
+    '''
+    wall = time.time()
+    cpu = get_cpu_time()
+    plot, table, parent, fmt = task
+    fig = draw_figure(plot, table)
+    fig.savefig(os.path.join(parent, _PLOT_FILE_NAMES[plot] + '.' + fmt))
+    return plot, time.time() - wall, get_cpu_time() - cpu
+
+
+def draw_figure(plot, table):
+    '''
+    Return a new figure on which the graph of the plot type is drawn.
+    '''
+    # matplotlib is imported by the first figure, so the runs which only
+    # export the results do not load it
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    _PLOTTERS[plot](fig, table)
+    return fig
+
+
+def load_manifest(parent):
+    '''
+    Return the manifest of the output directory, which maps the file
+    names of the figures to the hashes of their inputs.
+    '''
+    path = os.path.join(parent, _MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except ValueError:
+        logging.warning('broken manifest: ' + path)
+        return {}
+
+
+def save_manifest(parent, manifest):
+    path = os.path.join(parent, _MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.rename(path + '.tmp', path)
+
+
+def get_figure_hash(plot, table, fmt):
+    h = hashlib.sha1()
+    h.update(('%d:%s:%s:' % (_RENDER_VERSION, plot, fmt)).encode('ascii'))
+    h.update(repr(table.dtype.descr).encode('ascii'))
+    h.update(table.tobytes())
+    return h.hexdigest()
+
+
+def select_render_tasks(tasks, force=False):
+    '''
+    Return the tasks of render_figure whose figures are not in the
+    manifests of their output directories with the same hash, or all the
+    tasks if force is True, the (output directory, file name, hash) of
+    them and the manifests, which are saved by save_render_manifests
+    after the figures are rendered.
+    '''
+    manifests = {}
+    for parent in set(task[2] for task in tasks):
+        if not os.path.exists(parent):
+            os.makedirs(parent)
+        manifests[parent] = load_manifest(parent)
+
+    todo = []
+    hashes = []
+    for task in tasks:
+        plot, table, parent, fmt = task
+        name = _PLOT_FILE_NAMES[plot] + '.' + fmt
+        digest = get_figure_hash(plot, table, fmt)
+        if (not force and manifests[parent].get(name) == digest
+            and os.path.exists(os.path.join(parent, name))):
+            continue
+        todo.append(task)
+        hashes.append((parent, name, digest))
+    logging.info('render %d figures (%d unchanged)'
+                 % (len(todo), len(tasks) - len(todo)))
+    return todo, hashes, manifests
+
+
+def save_render_manifests(manifests, hashes):
+    for parent, name, digest in hashes:
+        manifests[parent][name] = digest
+    for parent in set(parent for parent, name, digest in hashes):
+        save_manifest(parent, manifests[parent])
+
+
+def count_render(times, num_unchanged):
+    '''
+    Add the render_figure times of the rendered figures and the number
+    of the unchanged ones to the profile.
+    '''
+    if _profiler is None:
+        return
+    _profiler.count('render', 'figures', len(times))
+    _profiler.count('render', 'unchanged', num_unchanged)
+    for plot, wall, cpu in times:
+        _profiler.add('render ' + plot, wall, cpu)
+
+
+def render_figures(tasks, num_workers=1, force=False):
+    '''
+    Render the tasks of render_figure. If num_workers is greater than 1
+    the figures and their file formats are rendered by a pool of worker
+    processes. A figure is skipped when the hash of its result table,
+    plot type and format is the same as the one in the manifest of its
+    output directory, unless force is True.
+    '''
+    todo, hashes, manifests = select_render_tasks(tasks, force)
+    with profile_stage('render'):
+        if num_workers <= 1 or len(todo) < 2:
+            times = [render_figure(task) for task in todo]
+        else:
+            pool = multiprocessing.Pool(num_workers)
+            try:
+                times = pool.map(render_figure, todo, 1)
+            finally:
+                pool.close()
+                pool.join()
+
+    count_render(times, len(tasks) - len(todo))
+    save_render_manifests(manifests, hashes)
+
+
+_PLOTTERS = {
+    'energy': plot_energy,
+    'response': plot_response,
+    'overflow': plot_overflow,
+    'spin': plot_spin,
+    'hit': plot_hit,
+    'statetime': plot_statetime,
+    'tail': plot_tail,
+    'throughput': plot_throughput,
+    'dashboard': plot_dashboard,
+    'heatmap': plot_heatmap,
+    'timeseries': plot_timeseries,
+}
 
 
 def sort_sim_results(sim_results):
-    zipped = sorted(zip([sr.get_x_tick_label() for sr in sim_results],sim_results))
-    ks, vs = zip(*zipped)
-    return vs
+    return sorted(sim_results, key=lambda sr: sr.get_x_tick_label())
+
+def parse_sim_result(path):
+    '''
+    Return the SimResult object of the summary file, or None if the file
+    is rejected by SimResult.parse_file or its compression cannot be read
+    without a module which is not installed, which is logged.
+    '''
+    try:
+        return SimResult(path)
+    except (ValueError, MissingModuleError) as e:
+        logging.warning('skipped %s' % e)
+        return None
+
+
+def try_parse_sim_result(path):
+    '''
+    Return the SimResult object of the summary file, or None if the file
+    fails to parse, which is logged.
+    '''
+    try:
+        return parse_sim_result(path)
+    except Exception:
+        logging.exception('failed to parse ' + path)
+        return None
+
+
+def parse_sim_results(paths, num_workers=1, skip_errors=False):
+    '''
+    Parse the summary files of the paths and return the SimResult objects
+    in the same order as the paths, without the files which are rejected
+    by SimResult.parse_file. If num_workers is greater than 1 the files
+    are parsed by a pool of worker processes. If skip_errors is True the
+    files which fail to parse for other errors are also left out.
+    '''
+    parse = try_parse_sim_result if skip_errors else parse_sim_result
+    started = time.time()
+    with profile_stage('parse'):
+        if num_workers <= 1 or len(paths) < 2:
+            objs = [parse(path) for path in paths]
+        else:
+            chunksize = max(1, len(paths) // (num_workers * 4))
+            pool = multiprocessing.Pool(num_workers)
+            try:
+                objs = pool.map(parse, paths, chunksize)
+            finally:
+                pool.close()
+                pool.join()
+
+    elapsed = time.time() - started
+    if _profiler is not None:
+        _profiler.count('parse', 'files', len(paths))
+        _profiler.count('parse', 'bytes',
+                        sum(os.path.getsize(path) for path in paths))
+    if paths:
+        logging.info('parsed %d files in %.3f s (%.1f files/s)'
+                     % (len(paths), elapsed, len(paths) / max(elapsed, 1e-9)))
+    return [obj for obj in objs if obj is not None]
+
+
+def get_trace_dir(path):
+    '''
+    Return the directory of the disk traces under _trace_dir of the run of
+    the summary file. The traces of a summary file in a subdirectory of
+    _input_dir, e.g. a replicate run of one random seed, are in the same
+    subdirectory under _trace_dir if it has them, and otherwise in
+    <trace dir>/<run name>/ like the others.
+    '''
+    name = get_run_name(path)
+    subdir = os.path.relpath(os.path.dirname(path), _input_dir)
+    if subdir != os.curdir and not subdir.startswith(os.pardir):
+        trace_dir = os.path.join(_trace_dir, subdir, name)
+        if os.path.isdir(trace_dir):
+            return trace_dir
+    return os.path.join(_trace_dir, name)
+
+
+def get_trace_paths(path):
+    '''
+    Return the paths of the disk traces under _trace_dir of the run of
+    the summary file, which may be compressed.
+    '''
+    trace_dir = get_trace_dir(path)
+    paths = [find_file(os.path.join(trace_dir, name)) for name in _TRACE_FILES]
+    return [p for p in paths if p is not None]
+
+
+def get_rotation_paths(path):
+    '''
+    Return the path of DiskRotationRatio.out under _trace_dir of the run
+    of the summary file in a list, or an empty list.
+    '''
+    path = find_file(os.path.join(get_trace_dir(path), _ROTATION_FILE))
+    return [path] if path is not None else []
+
+
+def load_disk_results(objs, num_workers=1, rotation=False):
+    '''
+    Set the percentiles of the response times in the disk traces of the
+    runs under _trace_dir, and the access counts and the average response
+    times per disk id, to the SimResult objects. The rotation hit ratios
+    per disk id of DiskRotationRatio.out are also set if rotation is True.
+    The traces of all the runs are counted in one pass by a pool of
+    worker processes if num_workers is greater than 1.
+    '''
+    runs = []
+    for obj in objs:
+        paths = get_trace_paths(obj.path)
+        if not paths:
+            logging.warning('no disk traces of ' + obj.path)
+        runs.append((paths, get_rotation_paths(obj.path) if rotation else []))
+
+    with profile_stage('tail'):
+        counters = diskperf.count_sweep(runs, num_workers=num_workers)
+    if _profiler is not None:
+        traces = [p for paths in runs for ps in paths for p in ps]
+        _profiler.count('tail', 'traces', len(traces))
+        _profiler.count('tail', 'bytes',
+                        sum(os.path.getsize(p) for p in traces))
+
+    for obj, (perf_paths, rotation_paths), (perf, rot) in zip(
+            objs, runs, counters):
+        if perf_paths:
+            percentiles = diskperf.get_percentiles(perf.get_histogram())
+            for name, value in zip(diskperf._QUANTILE_NAMES, percentiles):
+                setattr(obj, 'resp_' + name, value)
+        matrices = diskperf.get_disk_matrices([(perf, rot)])
+        num_disks = matrices['count'].shape[1]
+        if perf_paths and num_disks:
+            obj.disk_count = matrices['count'][0]
+            obj.disk_avgresp = matrices['avgresp'][0]
+        if rotation_paths and num_disks:
+            obj.disk_hitratio = matrices['hitratio'][0]
+
+
+def load_time_series(objs, window, num_workers=1):
+    '''
+    Set the series of diskperf._SERIES per window of window seconds of the
+    disk traces and DiskRotationRatio.out of the runs under _trace_dir to
+    the SimResult objects as ts_count, ts_avgresp, ts_maxresp and
+    ts_hitratio. The traces of all the runs are counted in one pass by a
+    pool of worker processes if num_workers is greater than 1.
+    '''
+    runs = [(get_trace_paths(obj.path), get_rotation_paths(obj.path))
+            for obj in objs]
+    counter_classes = (
+        functools.partial(diskperf.WindowPerfCounter, window),
+        functools.partial(diskperf.WindowRotationCounter, window))
+    with profile_stage('series'):
+        counters = diskperf.count_sweep(runs, num_workers=num_workers,
+                                        counter_classes=counter_classes)
+
+    for obj, (perf_paths, rotation_paths), pair in zip(objs, runs, counters):
+        if not perf_paths and not rotation_paths:
+            continue
+        series = diskperf.get_series(pair)
+        obj.ts_window = window
+        for name in diskperf._SERIES:
+            setattr(obj, 'ts_' + name, series[name])
+
+
+def ingest_sim_results(store, root):
+    '''
+    Save the summary files under the root into the result store. Only the
+    files which are new or changed since the last ingest are parsed, and
+    the files which no longer exist are removed from the store.
+    '''
+    root = os.path.abspath(root)
+    stored = store.get_stats()
+    seen = set()
+    stale = []
+    stats = {}
+    with profile_stage('scan'):
+        for path in generate_file_paths(
+                root, lambda name: path_filter.match(get_run_name(name)),
+                _num_walkers):
+            st = os.stat(path)
+            seen.add(path)
+            stats[path] = (st.st_mtime, st.st_size)
+            if stored.get(path) != stats[path]:
+                stale.append(path)
+
+    for obj in parse_sim_results(stale, _num_workers):
+        params = path_filter.match(get_run_name(obj.path)).groupdict()
+        mtime, size = stats[obj.path]
+        store.put(obj.path, mtime, size, params, obj.to_dict())
+
+    prefix = os.path.join(root, '')
+    removed = [p for p in stored if p.startswith(prefix) and p not in seen]
+    store.remove(removed)
+    store.commit()
+    logging.info('ingested %d files, removed %d files (%d files in %s)'
+                 % (len(stale), len(removed), len(seen), root))
+
+
+def query_sim_results(store, conditions):
+    '''
+    Return the SimResult objects in the store which match the conditions.
+    '''
+    with profile_stage('query'):
+        return [SimResult.from_dict(record)
+                for path, record in store.query(conditions)]
+
+
+def get_run_name(path):
+    '''
+    Return the name of the run of the summary file, which is the file
+    name without the compression suffix.
+    '''
+    return os.path.basename(strip_suffix(path))
+
 
-def generate_file_paths(root):
+def get_filter_params():
+    '''
+    Return the parameter names of path_filter in the order of the groups.
+    '''
+    return sorted(path_filter.groupindex, key=path_filter.groupindex.get)
+
+
+def find_sim_results(root):
+    '''
+    Return the paths of the summary files under the root which pass
+    test_condition.
+    '''
+    accept = test_condition
+    if _profiler is not None:
+        def accept(name):
+            matched = test_condition(name)
+            _profiler.count('scan', 'matched' if matched else 'rejected')
+            return matched
+
+    with profile_stage('scan'):
+        paths = list(generate_file_paths(root, accept, _num_walkers))
+    for path in paths:
+        logging.debug(path + ' passes filter')
+    return paths
+
+
+def scan_dir(path, accept=None):
+    '''
+    Return the paths of the files in the directory whose names are
+    accepted by accept, and the paths of the subdirectories. The entries
+    which are not accepted are dropped before they are stat'ed.
+    '''
+    files = []
+    dirs = []
+    if _scandir is None:
+        for name in os.listdir(path):
+            subpath = os.path.join(path, name)
+            if os.path.isdir(subpath):
+                dirs.append(subpath)
+            elif (accept is None or accept(name)) and os.path.isfile(subpath):
+                files.append(subpath)
+    else:
+        entries = _scandir(path)
+        try:
+            for entry in entries:
+                if entry.is_dir():
+                    dirs.append(entry.path)
+                elif ((accept is None or accept(entry.name))
+                      and entry.is_file()):
+                    files.append(entry.path)
+        finally:
+            # the iterator holds the directory open until it is exhausted
+            # or closed, which it can be since Python 3.6 and scandir 1.6
+            close = getattr(entries, 'close', None)
+            if close is not None:
+                close()
+    return files, dirs
+
+
+def generate_file_paths(root, accept=None, num_threads=1):
     '''
     This generator traverses from the root to the most deep offspring
-    directories. it traverses the directories with depth-first search.
-    '''
-    for path in os.listdir(root):
-        path = os.path.join(root, path)
-        if os.path.isdir(path):
-            for subpath in generate_file_paths(path):
-                yield subpath
-        elif os.path.isfile(path):
-            yield path
+    directories and yields the paths of the files whose names are
+    accepted by accept. It traverses the directories with breadth-first
+    search, and the directories of the same depth are listed by a pool
+    of num_threads threads.
+    '''
+    pool = None
+    if num_threads > 1:
+        pool = ThreadPool(num_threads)
+    try:
+        dirs = [root]
+        while dirs:
+            if pool is None or len(dirs) < 2:
+                results = (scan_dir(d, accept) for d in dirs)
+            else:
+                results = pool.imap_unordered(
+                    lambda d: scan_dir(d, accept), dirs)
+            subdirs = []
+            for files, ds in results:
+                for path in files:
+                    yield path
+                subdirs.extend(ds)
+            dirs = subdirs
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
         
 def get_output_dirname():
     parent = ''
     for cond in _conditions.values():
         parent = parent + '_' + cond
+    for param, value in _group:
+        parent = parent + '_' + value
     return os.path.join(_output_dir, parent)
 
 
+def get_group_key(obj, params):
+    '''
+    Return the tuple of the values of the filter parameters of the
+    SimResult object.
+    '''
+    return get_path_group_key(obj.path, params)
+
+
+def get_path_group_key(path, params):
+    regex_dict = path_filter.match(get_run_name(path)).groupdict()
+    return tuple(regex_dict[param] for param in params)
+
+
+def group_sim_results(objs, params):
+    '''
+    Partition the SimResult objects by the values of the filter parameters
+    and return a dictionary which maps the tuples of the values to the
+    lists of the objects.
+    '''
+    groups = {}
+    for obj in objs:
+        groups.setdefault(get_group_key(obj, params), []).append(obj)
+    return groups
+
+
 
 def print_usage(command_name):
     print '''
 Usage:
 
-python %s -G[energy] [,response] [,overflow] [,spin] [,hit] [,statetime] \
--D<dir>  -O<dir> \
+python %s -G[energy] [,response] [,overflow] [,spin] [,hit] [,statetime] [,tail] [,throughput] [,dashboard] [,heatmap] \
+-D<dir>  -O<dir> -T<dir> \
 -CONDNM=n,R=n,SM=[r|n],CMA=[dga|cs],CMF=[fix|share|simple],BM=[raposda|withallspins|spinupee],\
-WL=h:n_rr:n -NP
-''' % command_name
-
-
-def test_condition(path):
+WL=h:n_rr:n -E<file> -NP -j[n] -S<db> -INGEST --group-by KEY[,KEY...] --force \
+--watch[=SECONDS] --profile[=FILE] --cprofile=STAGE --throughput --window=SECONDS \
+--pipeline[=SIZE]
+
+  The summary files of the same name in different directories under -D,
+  e.g. one directory per random seed, are the replicate runs of a
+  configuration. They are plotted as one bar of the means of their
+  results with the error bars of the 95%% confidence intervals, and
+  exported as one row with the <column>_std and <column>_ci fields and
+  the number of the runs in replicates. The traces of a replicate run are
+  read from <dir of -T>/<subdirectory under -D>/<summary file name>/. The
+  replicates without their own traces share <dir of -T>/<summary file
+  name>/, and the columns and the plots of the traces have no confidence
+  intervals (NaN) then.
+
+  -E<file> write the parsed results and the parameters of the summary
+           file names of the runs to <file> in CSV, JSON or NPY by the
+           extension of <file>. No graph is plotted unless -G is given,
+           and matplotlib is not loaded then. With -T the NPY file also
+           has the access counts, the average response times and the
+           rotation hit ratios per disk id of every run in the fields
+           disk_count, disk_avgresp and disk_hitratio, and with
+           --window their series per window in ts_count, ts_avgresp,
+           ts_maxresp and ts_hitratio.
+  -T<dir>  read the disk traces (DataDiskPerf.out, CacheDiskPerf.out and
+           DiskRotationRatio.out) of a run from <dir>/<summary file name>/
+           for the tail and heatmap plots. The traces of all the runs
+           are counted in one pass. The heatmap plot shows the accesses
+           relative to the mean of the accessed disks of the run, the
+           average response time and the rotation hit ratio of every
+           disk of every run, and the ratio of the busiest disk to the
+           mean after the run labels. The timeseries plot shows the
+           accesses per second, the average and the maximum response
+           times and the rotation hit ratio of all the disks of every
+           run per window of the arrival times.
+  --window=SECONDS
+           count the disk traces of the timeseries plot in windows of
+           SECONDS seconds. (default: %g)
+  The summary files and the traces compressed by gzip (.gz), bzip2
+  (.bz2), xz (.xz) or zstd (.zst) are read without unpacking them.
+  -j[n]  parse the summary files and render the figures with n worker
+         processes. n defaults to the number of CPUs.
+  -S<db>   read the results from the sqlite result store <db> instead of
+           scanning the input directory.
+  -INGEST  update the result store with the new or changed files of the
+           input directory before reading it.
+  --group-by KEY[,KEY...]
+           partition the results by the keys of -COND (NM, R, SM, CMA,
+           CMF, BM, WL, h or rr) and plot every group into its own output
+           directory. All the graphs except dashboard are plotted when -G
+           is not given. -Gdashboard plots the energy, response,
+           overflow, spin, hit and statetime graphs of a group into one
+           figure instead.
+  --force  render all the figures even if their results are unchanged
+           since the last run.
+  --throughput
+           print the average simulated seconds, requests and data disk
+           accesses per wall clock second of the runs and their total
+           elapsed time by buffer manager, storage manager, replica level
+           and workload parameters. The throughput plot shows them per
+           run.
+  --pipeline[=SIZE]
+           walk the input directory, parse the summary files and render
+           the figures at the same time. The figures of a group of
+           --group-by are rendered as soon as all of its runs are
+           parsed. At most SIZE files are parsed and SIZE figures are
+           rendered at a time (default: %d). Not with -S, -E nor
+           --throughput.
+  --watch[=SECONDS]
+           poll the input directory every SECONDS seconds (default: %d)
+           until interrupted. The summary files of the runs which have
+           finished since the last poll are parsed, and the graphs of
+           their groups are rendered again.
+  --profile[=FILE]
+           print the wall and CPU times, the calls and the counters of
+           the stages (scan, parse, query, sort, tail, series, render,
+           pipeline and every plot type) and write them to FILE in JSON.
+  --cprofile=STAGE
+           profile the stage with cProfile and save the statistics to
+           asmgraph-STAGE.prof. The stages run by worker processes are
+           profiled only with -j1.
+''' % (command_name, diskperf._WINDOW, _PIPELINE_SIZE, _WATCH_INTERVAL)
+
+
+def test_condition(path, conditions=None):
+    if conditions is None:
+        conditions = _conditions
     regex_ret = None
-    regex_ret = path_filter.match(os.path.basename(path))
+    regex_ret = path_filter.match(get_run_name(path))
     condition = False
     if (regex_ret):
         condition = True
         regex_dict = regex_ret.groupdict()
-        for k, v in _conditions.iteritems():
+        for k, v in conditions.iteritems():
             if (not (k in regex_dict)) or (regex_dict[k] != v):
                 condition = False
                 break
@@ -644,15 +1987,51 @@ def parse_command_line(args):
     global _input_dir
     global _output_dir
     global _file_formats
+    global _num_workers
+    global _store_path
+    global _ingest
+    global _group_by
+    global _force
+    global _trace_dir
+    global _watch_interval
+    global _window
+    global _pipeline_size
+    global _profile
+    global _profile_path
+    global _cprofile_stage
+    global _profiler
+    global _export_path
+    global _throughput
 
     _to_plot_list = []
 
+    args = iter(args)
     for item in args:
-        if item.startswith('-G'):
+        if item == '--force':
+            _force = True
+        elif item == '--throughput':
+            _throughput = True
+        elif item.startswith('--profile'):
+            _profile = True
+            _profile_path = item[len('--profile='):] or None
+        elif item.startswith('--cprofile='):
+            _cprofile_stage = item[len('--cprofile='):]
+        elif item.startswith('--watch'):
+            _watch_interval = float(item[len('--watch='):] or _WATCH_INTERVAL)
+        elif item.startswith('--pipeline'):
+            _pipeline_size = int(item[len('--pipeline='):] or _PIPELINE_SIZE)
+        elif item.startswith('--window='):
+            _window = float(item[len('--window='):])
+        elif item.startswith('--group-by'):
+            keys = item[len('--group-by='):] or next(args, '')
+            _group_by = parse_group_by(keys)
+        elif item.startswith('-G'):
             for plot in item[2:].split(','):
                 logging.info('plotargs='+ plot)
                 if plot in _PLOT_TYPE:
                     _to_plot_list.append(plot)
+        elif item.startswith('-E'):
+            _export_path = item[2:]
         elif item.startswith('-D'):
             _input_dir = item[2:]
         elif item.startswith('-O'):
@@ -661,9 +2040,51 @@ def parse_command_line(args):
             parse_conditions(item[5:])
         elif item.startswith('-NP'):
             _file_formats.remove('png')
+        elif item.startswith('-T'):
+            _trace_dir = item[2:]
+        elif item.startswith('-S'):
+            _store_path = item[2:]
+        elif item.startswith('-INGEST'):
+            _ingest = True
+        elif item.startswith('-j'):
+            if item[2:]:
+                _num_workers = int(item[2:])
+            else:
+                _num_workers = multiprocessing.cpu_count()
+
+    if _profile or _cprofile_stage:
+        _profiler = Profiler(_cprofile_stage,
+                             'asmgraph-%s.prof' % _cprofile_stage)
+
+def parse_group_by(keys):
+    '''
+    Translate the grouping keys of --group-by, e.g. "R,CMA,WL", to the
+    parameter names of path_filter. WL groups by all of the workload
+    parameters and h or rr by one of them.
+    '''
+    params = []
+    for k in keys.split(','):
+        if k == 'WL':
+            params.extend(p for p in get_filter_params() if p.startswith('wl_'))
+        elif k in ('h', 'rr'):
+            params.append('wl_' + _CONDITION_TRANSLATE_TABLE[k])
+        else:
+            params.append(_CONDITION_TRANSLATE_TABLE[k])
+    logging.debug("group by: %s" % params)
+    return params
+
 
 def parse_conditions(conditions):
     global _conditions
+    _conditions = get_conditions(conditions)
+    logging.debug(_conditions)
+
+
+def get_conditions(conditions):
+    '''
+    Translate the conditions of -COND, e.g. "R=2,WL=h:0_rr:9", to a
+    dictionary which maps the parameter names of path_filter to the values.
+    '''
     l = []
 
     logging.debug("conditions: " + conditions)
@@ -682,25 +2103,370 @@ def parse_conditions(conditions):
             k = _CONDITION_TRANSLATE_TABLE[k]
             l.append((k,v))
             logging.debug("appended condition: key=%s, val=%s" % (k,v))
-    _conditions = dict(l)
-    logging.debug(_conditions)
+    return dict(l)
 
     
-def main():
+def get_render_tasks(objs):
+    '''
+    Return the tasks of render_figure which plot the graphs of
+    _to_plot_list for the SimResult objects in every file format.
+    '''
     global _sim_results
 
-    for path in generate_file_paths(_input_dir):
-        # print 'scan', path
-        if (test_condition(path)):
-            logging.info(path + 'is passes filter')
-            obj = SimResult(path)
-            _sim_results[os.path.basename(obj.path)] = obj
-
-    # plot graphs
-    for plot in _to_plot_list:
-        if plot in _PLOT_TYPE:
-            eval('plot_' + plot)()
-        
+    if not objs:
+        logging.warning('no results to plot in ' + get_output_dirname())
+        return []
+
+    # the replicate runs of a configuration have the same run name in
+    # different directories, and are aggregated by build_result_table
+    _sim_results = {}
+    for obj in objs:
+        _sim_results[obj.path] = obj
+    table = build_result_table(_sim_results.values())
+    parent = get_output_dirname()
+
+    return [(plot, table, parent, fmt)
+            for plot in _to_plot_list if plot in _PLOT_TYPE
+            if plot not in _TRACE_PLOTS or _trace_dir
+            for fmt in _file_formats]
+
+
+def render_groups(objs):
+    '''
+    Plot the graphs for every group of _group_by into its own directory.
+    '''
+    global _group
+
+    tasks = []
+    groups = group_sim_results(objs, _group_by)
+    for key in sorted(groups):
+        _group = zip(_group_by, key)
+        logging.info('render group %s (%d results)'
+                     % (', '.join('%s=%s' % kv for kv in _group),
+                        len(groups[key])))
+        tasks.extend(get_render_tasks(groups[key]))
+    _group = []
+    render_figures(tasks, _num_workers, _force)
+
+
+def is_complete(path):
+    '''
+    Return True if the simulation of the summary file has finished, that
+    is the file ends with the Elapsed Time line. A compressed file is
+    complete when it is decompressed to the end, and a corrupt one is not
+    complete.
+    '''
+    if is_compressed(path):
+        try:
+            tail = read_tail(path, _SUMMARY_TAIL_SIZE)
+        except MissingModuleError as e:
+            logging.warning('skipped %s' % e)
+            return False
+        except DECOMPRESS_ERRORS:
+            return False
+        return _ELAPSED_TIME_LINE.search(tail) is not None
+
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - _SUMMARY_TAIL_SIZE))
+            tail = f.read().decode('ascii', 'replace')
+    except IOError:
+        return False
+    return _ELAPSED_TIME_LINE.search(tail) is not None
+
+
+def update_sim_results(results, stats, paths, num_workers=1, traces=False,
+                       rotation=False, window=None):
+    '''
+    Bring the SimResult objects of results, which maps the paths of the
+    complete summary files to them, up to date with the paths found by a
+    scan. stats maps the paths to their (mtime, size) when they were
+    checked last, and only the files which are new or changed and
+    complete are parsed. The results of the disk traces of the parsed
+    runs are loaded by load_disk_results if traces is True, with the
+    rotation hit ratios if rotation is True, and their time series of
+    load_time_series if window is given. Return the lists of the parsed
+    and the removed SimResult objects. The files which fail to parse are
+    logged and parsed again by the next update.
+    '''
+    seen = set()
+    changed = {} # path -> (mtime, size) of the complete files to parse
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        seen.add(path)
+        stat = (st.st_mtime, st.st_size)
+        if stats.get(path) != stat:
+            if is_complete(path):
+                changed[path] = stat
+            else:
+                stats[path] = stat
+
+    objs = parse_sim_results(sorted(changed), num_workers, skip_errors=True)
+    for obj in objs:
+        stats[obj.path] = changed[obj.path]
+    if traces:
+        load_disk_results(objs, num_workers, rotation)
+    if window:
+        load_time_series(objs, window, num_workers)
+    removed = [results.pop(path) for path in list(results)
+               if path not in seen]
+    for path in list(stats):
+        if path not in seen:
+            del stats[path]
+    for obj in objs:
+        results[obj.path] = obj
+    return objs, removed
+
+
+def watch_sim_results(interval):
+    '''
+    Poll the input directory every interval seconds until interrupted.
+    The summary files which are new or changed and complete are parsed,
+    and the graphs of the groups of _group_by which have a new, changed
+    or removed result are rendered. The results of the other files are
+    kept in memory between the polls.
+    '''
+    global _group
+
+    stats = {} # path -> (mtime, size) when the file was checked last
+    results = {} # path -> SimResult of the complete files
+    while True:
+        traces = bool(_trace_dir) and any(p in _TRACE_PLOTS
+                                          for p in _to_plot_list)
+        window = None
+        if _trace_dir and 'timeseries' in _to_plot_list:
+            window = _window or diskperf._WINDOW
+        objs, removed = update_sim_results(
+            results, stats, find_sim_results(_input_dir), _num_workers,
+            traces, 'heatmap' in _to_plot_list, window)
+        keys = set(get_group_key(obj, _group_by) for obj in objs + removed)
+
+        if keys:
+            logging.info('%d finished, %d removed runs (%d runs)'
+                         % (len(objs), len(removed), len(results)))
+            groups = group_sim_results(results.values(), _group_by)
+            tasks = []
+            for key in sorted(keys):
+                _group = zip(_group_by, key)
+                tasks.extend(get_render_tasks(groups.get(key, [])))
+            _group = []
+            render_figures(tasks, _num_workers, _force)
+        time.sleep(interval)
+
+
+def load_trace_results(objs, export=False):
+    '''
+    Load the results of the disk traces under _trace_dir of the runs which
+    are needed by the plots of _to_plot_list, and by -E if export is True.
+    '''
+    if not _trace_dir:
+        return
+    npy = export and _export_path.lower().endswith('.npy')
+    if export or any(p in _TRACE_PLOTS for p in _to_plot_list):
+        load_disk_results(objs, _num_workers,
+                          'heatmap' in _to_plot_list or npy)
+    if 'timeseries' in _to_plot_list or (export and _window):
+        load_time_series(objs, _window or diskperf._WINDOW, _num_workers)
+
+
+def pipeline_sim_results(root, queue_size):
+    '''
+    Scan, parse and render the results under the root as a pipeline. The
+    directories are walked by the task feeder of a pool of worker
+    processes while the workers parse the summary files found so far, so
+    at most queue_size files are being parsed at a time. The parsed
+    results are collected into the groups of _group_by, and the figures
+    of a group are queued to the same pool as soon as all of its scanned
+    runs are parsed, at most queue_size figures at a time. The results of
+    a group are released when its figures are queued. If a file fails to
+    parse or a figure fails to render, the walk is stopped, the pool is
+    terminated and the exception is raised.
+    '''
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(queue_size)
+    expected = {} # group key -> number of the scanned files
+    scanned = threading.Event()
+    stopped = threading.Event()
+
+    def scan():
+        for path in generate_file_paths(root, test_condition, _num_walkers):
+            with lock:
+                key = get_path_group_key(path, _group_by)
+                expected[key] = expected.get(key, 0) + 1
+            slots.acquire()
+            if stopped.is_set():
+                break
+            yield path
+        scanned.set()
+
+    groups = {} # group key -> parsed SimResult objects
+    rendering = deque() # AsyncResults of render_figure
+    times = []
+    updates = [] # (manifests, hashes) of select_render_tasks
+    unchanged = [0]
+
+    def flush(key):
+        global _group
+
+        objs = groups.pop(key)
+        _group = zip(_group_by, key)
+        logging.info('render group %s (%d results)'
+                     % (', '.join('%s=%s' % kv for kv in _group) or 'of all',
+                        len(objs)))
+        load_trace_results(objs)
+        tasks = get_render_tasks(objs)
+        _group = []
+        todo, hashes, manifests = select_render_tasks(tasks, _force)
+        updates.append((manifests, hashes))
+        unchanged[0] += len(tasks) - len(todo)
+        for task in todo:
+            if len(rendering) >= queue_size:
+                times.append(rendering.popleft().get())
+            rendering.append(pool.apply_async(render_figure, (task,)))
+
+    if _num_workers <= 1:
+        # the files are still read and the figures rendered while the
+        # directories are walked
+        pool = ThreadPool(1)
+    else:
+        pool = multiprocessing.Pool(_num_workers)
+    num_parsed = 0
+    with profile_stage('pipeline'):
+        try:
+            swept = False
+            for obj in pool.imap_unordered(parse_sim_result, scan()):
+                slots.release()
+                if obj is None:
+                    # the group of a rejected file is rendered after the
+                    # last file is parsed
+                    continue
+                num_parsed += 1
+                key = get_group_key(obj, _group_by)
+                groups.setdefault(key, []).append(obj)
+                if not scanned.is_set():
+                    continue
+                # no more runs are added to the groups after the walk
+                keys = [key] if swept else sorted(groups)
+                swept = True
+                for k in keys:
+                    if k in groups and len(groups[k]) == expected[k]:
+                        flush(k)
+            for key in sorted(groups):
+                flush(key)
+            while rendering:
+                times.append(rendering.popleft().get())
+        except BaseException:
+            # the walk may wait for a slot on the task feeder of the pool,
+            # which is joined by terminate
+            stopped.set()
+            # a slot is added only if none is free, so that the bounded
+            # semaphore does not overflow when the walk is not waiting
+            slots.acquire(False)
+            slots.release()
+            pool.terminate()
+            raise
+        else:
+            pool.close()
+        finally:
+            pool.join()
+
+    if _profiler is not None:
+        _profiler.count('pipeline', 'files', num_parsed)
+        _profiler.count('pipeline', 'groups', len(expected))
+    count_render(times, unchanged[0])
+    for manifests, hashes in updates:
+        save_render_manifests(manifests, hashes)
+    logging.info('rendered %d figures of %d groups of %d files'
+                 % (len(times), len(expected), num_parsed))
+
+
+def main():
+    global _to_plot_list
+
+    # all the plot types are rendered by --group-by when -G is not given
+    if _group_by and not _to_plot_list and not (_export_path or _throughput):
+        _to_plot_list = [p for p in _PLOT_TYPE if p != 'dashboard']
+
+    for plot in _TRACE_PLOTS:
+        if plot in _to_plot_list and not _trace_dir:
+            logging.warning(plot + ' needs the disk traces given by -T')
+
+    if _watch_interval is not None:
+        if _store_path:
+            logging.warning('--watch reads the input directory, not '
+                            + _store_path)
+        try:
+            watch_sim_results(_watch_interval)
+        except KeyboardInterrupt:
+            logging.info('stopped watching ' + _input_dir)
+        return
+
+    if _pipeline_size:
+        if not (_store_path or _export_path or _throughput):
+            pipeline_sim_results(_input_dir, _pipeline_size)
+            return
+        logging.warning('--pipeline renders only the graphs of the input '
+                        'directory without -S, -E and --throughput')
+
+    if _store_path:
+        store = ResultStore(_store_path, get_filter_params(), _STORE_VERSION)
+        try:
+            if _ingest:
+                ingest_sim_results(store, _input_dir)
+            objs = query_sim_results(store, _conditions)
+        finally:
+            store.close()
+    else:
+        objs = parse_sim_results(find_sim_results(_input_dir), _num_workers)
+
+    load_trace_results(objs, bool(_export_path))
+
+    if _export_path:
+        export_sim_results(objs, _export_path)
+    if _throughput:
+        for line in format_throughput_report(build_result_table(objs)):
+            sys.stdout.write(line + '\n')
+    if (_export_path or _throughput) and not _to_plot_list:
+        return
+
+    if _group_by:
+        render_groups(objs)
+    else:
+        render_figures(get_render_tasks(objs), _num_workers, _force)
+
+
+@contextmanager
+def profile_stage(name):
+    '''
+    Record the block as a call of the stage when --profile is given.
+    '''
+    if _profiler is None:
+        yield
+    else:
+        with _profiler.stage(name):
+            yield
+
+
+def report_profile():
+    '''
+    Print the table of the stages of --profile and save the JSON and the
+    cProfile statistics of the stage of --cprofile.
+    '''
+    if _profiler is None:
+        return
+    for line in _profiler.format_table():
+        sys.stdout.write(line + '\n')
+    if _profile_path:
+        _profiler.save(_profile_path)
+    _profiler.save_cprofile()
+    if _cprofile_stage:
+        logging.info('cProfile of %s: %s'
+                     % (_cprofile_stage, _profiler.cprofile_path))
+
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
@@ -711,4 +2477,7 @@ if __name__ == '__main__':
         exit()
 
     parse_command_line(sys.argv[1:])
-    main()
+    try:
+        main()
+    finally:
+        report_profile()
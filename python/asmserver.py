@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+
+import io
+import sys
+import json
+import time
+import logging
+import multiprocessing
+from collections import OrderedDict
+
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from urlparse import urlparse, parse_qs
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from urllib.parse import urlparse, parse_qs
+
+import asmgraph
+
+logging.basicConfig(level=logging.INFO)
+
+'''
+Resident query server of the summary files.
+
+The summary files under the input directory are parsed once and kept in
+memory, and the plots and the tables of asmgraph.py are served over HTTP
+on localhost, so a question about a sweep does not pay the start-up, the
+scan and the parsing of a new asmgraph.py run. Before a request is
+answered the input directory is scanned again if the last scan is older
+than the refresh interval, and only the new or changed summary files are
+parsed.
+
+  GET /plot?G=<plot type>&COND=<conditions>&format=<png|eps|svg|pdf>
+      the figure of the runs which match the conditions of -COND.
+  GET /table?COND=<conditions>&format=<csv|json|npy>
+      the table of asmgraph.py -E of the runs.
+  GET /runs?COND=<conditions>
+      the run names in JSON.
+
+The server answers one request at a time, so the globals of asmgraph are
+never shared by two requests.
+'''
+
+_HOST = '127.0.0.1'
+_PORT = 8150
+_REFRESH_INTERVAL = 2.0
+# rendered figures which are kept for the same results, plot and format
+_FIGURE_CACHE_SIZE = 64
+
+_CONTENT_TYPES = {
+    'png': 'image/png',
+    'eps': 'application/postscript',
+    'svg': 'image/svg+xml',
+    'pdf': 'application/pdf',
+    'csv': 'text/csv',
+    'json': 'application/json',
+    'npy': 'application/octet-stream',
+}
+
+
+class QueryError(Exception):
+    pass
+
+
+class ResultIndex(object):
+    '''
+    The SimResult objects of the complete summary files under the root,
+    which are updated by refresh().
+    '''
+
+    def __init__(self, root, num_workers=1, traces=False, window=None,
+                 refresh_interval=_REFRESH_INTERVAL):
+        self.root = root
+        self.num_workers = num_workers
+        self.traces = traces
+        self.window = window
+        self.refresh_interval = refresh_interval
+        self.results = {} # path -> SimResult
+        self.stats = {} # path -> (mtime, size)
+        self.refreshed = None
+        self.figures = OrderedDict() # figure hash -> bytes
+
+    def refresh(self, force=False):
+        '''
+        Parse the new or changed summary files and drop the removed ones,
+        unless the last scan is younger than the refresh interval.
+        '''
+        now = time.time()
+        if (not force and self.refreshed is not None
+            and now - self.refreshed < self.refresh_interval):
+            return
+        paths = list(asmgraph.generate_file_paths(
+            self.root, lambda name: asmgraph.test_condition(name, {}),
+            asmgraph._num_walkers))
+        objs, removed = asmgraph.update_sim_results(
+            self.results, self.stats, paths, self.num_workers, self.traces,
+            self.traces, self.window)
+        if objs or removed:
+            logging.info('%d new, %d removed runs (%d runs)'
+                         % (len(objs), len(removed), len(self.results)))
+        self.refreshed = time.time()
+
+    def select(self, conditions):
+        '''
+        Return the SimResult objects which match the conditions of -COND.
+        '''
+        try:
+            conds = asmgraph.get_conditions(conditions) if conditions else {}
+        except (KeyError, ValueError):
+            raise QueryError('bad conditions: ' + conditions)
+        return [obj for path, obj in self.results.items()
+                if asmgraph.test_condition(path, conds)]
+
+    def get_table(self, conditions, fmt):
+        if fmt not in asmgraph._EXPORT_FORMATS:
+            raise QueryError('unknown table format: ' + fmt)
+        objs = self.select(conditions)
+        f = io.BytesIO()
+        asmgraph.write_export_table(f, asmgraph.build_export_table(objs), fmt)
+        return f.getvalue()
+
+    def get_figure(self, plot, conditions, fmt):
+        if plot not in asmgraph._PLOT_TYPE:
+            raise QueryError('unknown plot type: ' + plot)
+        if fmt not in _CONTENT_TYPES or fmt in asmgraph._EXPORT_FORMATS:
+            raise QueryError('unknown figure format: ' + fmt)
+        if plot in asmgraph._TRACE_PLOTS and not self.traces:
+            raise QueryError(plot + ' needs the disk traces given by -T')
+        if plot == 'timeseries' and not self.window:
+            raise QueryError('timeseries needs the window given by -W')
+        objs = self.select(conditions)
+        if not objs:
+            raise QueryError('no results match ' + conditions)
+
+        table = asmgraph.build_result_table(objs)
+        digest = asmgraph.get_figure_hash(plot, table, fmt)
+        if digest in self.figures:
+            self.figures[digest] = self.figures.pop(digest)
+            return self.figures[digest]
+        f = io.BytesIO()
+        asmgraph.draw_figure(plot, table).savefig(f, format=fmt)
+        self.figures[digest] = f.getvalue()
+        while len(self.figures) > _FIGURE_CACHE_SIZE:
+            self.figures.popitem(last=False)
+        return self.figures[digest]
+
+    def get_runs(self, conditions):
+        names = sorted(asmgraph.get_run_name(obj.path)
+                       for obj in self.select(conditions))
+        return json.dumps({'runs': names, 'count': len(names)}, indent=1)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = dict((k, v[-1]) for k, v in parse_qs(url.query).items())
+        index = self.server.index
+        conditions = query.get('COND', '')
+        started = time.time()
+        try:
+            index.refresh()
+            if url.path == '/plot':
+                fmt = query.get('format', 'png')
+                body = index.get_figure(query.get('G', ''), conditions, fmt)
+            elif url.path == '/table':
+                fmt = query.get('format', 'json')
+                body = index.get_table(conditions, fmt)
+            elif url.path == '/runs':
+                fmt = 'json'
+                body = index.get_runs(conditions)
+            else:
+                self.send_error(404)
+                return
+        except QueryError as e:
+            self.send_error(400, str(e))
+            return
+        except Exception as e:
+            logging.exception('failed to answer ' + self.path)
+            self.send_error(500, '%s: %s' % (type(e).__name__, e))
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', _CONTENT_TYPES[fmt])
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        logging.debug('%s in %.3f s' % (self.path, time.time() - started))
+
+    def log_message(self, format, *args):
+        logging.info('%s %s' % (self.address_string(), format % args))
+
+
+def serve(index, port=_PORT):
+    server = HTTPServer((_HOST, port), QueryHandler)
+    server.index = index
+    logging.info('serving %d runs of %s on http://%s:%d/'
+                 % (len(index.results), index.root, _HOST, port))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def print_usage(command_name):
+    sys.stdout.write('''
+Usage:
+
+python %s -D<dir> [-T<dir> [-W<seconds>]] [-j[n]] [-P<port>] [-R<seconds>]
+
+  Parse the summary files under <dir> once and answer the plot and table
+  requests of them on http://%s:<port>/ until interrupted.
+
+    /plot?G=<plot type>&COND=<conditions>&format=<png|eps|svg|pdf>
+    /table?COND=<conditions>&format=<csv|json|npy>
+    /runs?COND=<conditions>
+
+  The plot types and the conditions are the ones of -G and -COND of
+  asmgraph.py, e.g. /plot?G=energy&COND=R=2,WL=h:0_rr:9. The table is the
+  one of asmgraph.py -E.
+
+  -T<dir>       read the disk traces of the runs from <dir> for the tail
+                and heatmap plots and the table.
+  -W<seconds>   count the disk traces in windows of <seconds> seconds for
+                the timeseries plot.
+  -j[n]         parse the summary files with n worker processes.
+                n defaults to the number of CPUs.
+  -P<port>      listen on <port>. (default: %d)
+  -R<seconds>   scan <dir> for the new, changed and removed summary files
+                before a request when the last scan is older than
+                <seconds>. (default: %g)
+''' % (command_name, _HOST, _PORT, _REFRESH_INTERVAL))
+
+
+def main(args):
+    input_dir = '.'
+    num_workers = 1
+    port = _PORT
+    refresh_interval = _REFRESH_INTERVAL
+    window = None
+    for item in args:
+        if item.startswith('-D'):
+            input_dir = item[2:]
+        elif item.startswith('-T'):
+            asmgraph._trace_dir = item[2:]
+        elif item.startswith('-j'):
+            if item[2:]:
+                num_workers = int(item[2:])
+            else:
+                num_workers = multiprocessing.cpu_count()
+        elif item.startswith('-P'):
+            port = int(item[2:])
+        elif item.startswith('-R'):
+            refresh_interval = float(item[2:])
+        elif item.startswith('-W'):
+            window = float(item[2:])
+
+    # the traces of the replicate runs are looked up under -T by their
+    # subdirectories of the input directory
+    asmgraph._input_dir = input_dir
+    traces = bool(asmgraph._trace_dir)
+    index = ResultIndex(input_dir, num_workers, traces,
+                        window if traces else None, refresh_interval)
+    index.refresh(force=True)
+    try:
+        serve(index, port)
+    except KeyboardInterrupt:
+        logging.info('stopped serving ' + input_dir)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '-help'):
+        print_usage(sys.argv[0])
+        exit()
+
+    main(sys.argv[1:])
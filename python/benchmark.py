@@ -0,0 +1,503 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import platform
+import subprocess
+import multiprocessing
+
+import asmgraph
+import diskperf
+import tracecols
+
+logging.basicConfig(level=logging.INFO)
+
+'''
+Benchmarks of asmgraph.py, diskperf.py and the awk scripts on a synthetic
+sweep.
+
+The summary files are generated into <workdir>/summary-<n>/lam<lambda>/,
+one directory per workload lambda, with the names matched by
+asmgraph.path_filter and the layout read by SimResult.parse_file. The
+disk traces are generated into <workdir>/trace-<n>/ in the CSV layouts of
+DataDiskPerf.out and DiskRotationRatio.out. The data is generated once
+per scale and reused by the later runs.
+
+Every stage is timed separately and the results are written to a JSON
+file, which -B compares with the results of another commit.
+'''
+
+_WORK_DIR = 'bench'
+_NUM_SUMMARIES = 1000
+_NUM_TRACE_LINES = 1000000
+_NUM_DISKS = 40
+_RESULT_FILE = 'benchmark.json'
+_SEED = 12345
+# lines of a trace which are formatted and written at a time
+_GENERATE_LINES = 100000
+
+_STAGES = ('scan', 'filter', 'parse', 'table', 'render',
+           'trace', 'trace_awk', 'convert', 'trace_cols', 'rotation')
+
+# the axes of the sweep except the workload lambda, which is increased
+# after all the combinations of them are generated
+_SWEEP_AXES = (
+    ('num_mem', (1, 2, 3)),
+    ('rep_level', (2, 3, 4)),
+    ('storage_manager', ('n', 'r')),
+    ('mem_assignor', ('cs', 'dga')),
+    ('memory_manager', ('fix', 'share')),
+    ('buffer_manager', ('raposda', 'withall', 'spinupee')),
+    ('wl_read_ratio', (0, 3, 5, 7)),
+)
+_STORAGE_MANAGERS = {'n': 'Normal', 'r': 'RAPoSDA'}
+_MEMORY_MANAGERS = {'fix': 'FixedRegionSize', 'share': 'SharedRegions'}
+_BUFFER_MANAGERS = {'raposda': 'RAPoSDA', 'withall': 'FlushToAllSpinningDisk',
+                    'spinupee': 'SpinupEnergyEfficientDisks'}
+
+_SUMMARY_NAME = ('DD10CD6NM%(num_mem)dMS4R%(rep_level)dSM%(storage_manager)s'
+                 'CMA%(mem_assignor)sCMF%(memory_manager)sBS65536'
+                 'BM%(buffer_manager)s_Wworkload.12h.rr%(wl_read_ratio)d'
+                 '.lam%(wl_lambda)d.the12.ds10TB')
+
+_SUMMARY_TEMPLATE = '''=========================================
+Storage Simulator Version 2.
+Starting time at: Wed Jul 31 18:43:45 JST 2013
+=========================================
+Data disks               = %(num_dd)d (10disks/memory)
+Cache disks              = 6
+Replicas                 = %(rep_level)d
+Number of cache memories = %(num_mem)d
+Memory size(1 unit)      = 4,294,967,296Byte
+Block size               = 65,536Byte
+CacheMemoryAssignor   = %(mem_assignor)s
+CacheMemoryFactory    = sim.storage.manager.cmm.%(memory_factory)sCacheMemoryFactory
+StorageManagerFactory = sim.storage.manager.%(storage_factory)sStorageManagerFactory
+BufferManagerFactory  = sim.storage.manager.buffer.%(buffer_factory)sBufferManagerFactory
+Workload              = config/workload/workload.12h.rr%(wl_read_ratio)d.lam%(wl_lambda)d.the12.ds10TB
+------------------
+Simulation Time: %(sim_time).3f
+Total Energy(totaltime : avg time): %(energy)s
+  ACTIVE   : %(active)s
+  IDLE     : %(idle)s
+  STANDBY  : %(standby)s
+  SPINDOWN : %(spindown)s
+  SPINUP   : %(spinup)s
+Avg. Response Time: %(response).6f
+Total Request count  : %(requests)s
+  Read Request count : %(reads)s(%(read_blocks)s)
+  Write Request count: %(writes)s(%(write_blocks)s)
+Cache memory read count (hit ratio): %(mem_reads)s(%(mem_read_hit).4f)
+Cache memory write count(hit ratio): %(mem_writes)s(1.0000)
+Avg. data disk response time : %(dd_response).6f
+data disk access count         : %(dd_accesses)s
+  data disk read access count  : %(dd_reads)s
+  data disk write access count : %(dd_writes)s
+Avg. cache disk response time: %(cd_response).6f
+cache disk access count(actual)         : %(cd_accesses)s(%(cd_actual)s)
+  cache disk read access count(hit ratio) : %(cd_reads)s(%(cd_hit).4f)
+  cache disk write access count(hit ratio): %(dd_accesses)s(1.0000)
+Spindown count: %(spindowns)d
+Spinup   count: %(spinups)d
+Buffer overflow count: %(overflows)d
+End time at: Wed Jul 31 19:00:45 JST 2013
+Elapsed Time: %(elapsed)s[s]
+'''
+
+_TRACE_HEADER = 'diskid,arrival,start,end,response,type\n'
+_TRACE_FORMAT = '%d,%.6f,%.6f,%.6f,%.6f,%s'
+_TRACE_TYPES = ('READ', 'WRITE', 'BG_WRITE', 'SPINUP')
+_ROTATION_HEADER = 'time,blockid,diskid,start,end,rotating\n'
+_ROTATION_FORMAT = '%.6f,%d,%d,%.6f,%.6f,%s'
+
+
+def _number(n, digits=0):
+    return '{0:,.{1}f}'.format(n, digits)
+
+
+def _energy_state(rng, total):
+    return '%s(%s : %s)' % (_number(total, 4),
+                            _number(rng.uniform(1, 1e6), 4),
+                            _number(rng.uniform(0, 10), 4))
+
+
+def get_sweep_params(index):
+    '''
+    Return the parameters of the index-th run of the sweep.
+    '''
+    params = {}
+    for name, values in reversed(_SWEEP_AXES):
+        params[name] = values[index % len(values)]
+        index //= len(values)
+    params['wl_lambda'] = 30 + index
+    return params
+
+
+def format_summary(params, rng):
+    '''
+    Return the text of a summary file of the run of the parameters with
+    random results.
+    '''
+    values = dict(params)
+    energies = [rng.uniform(1e4, 4e6) for i in range(5)]
+    requests = 1296000
+    reads = requests * params['wl_read_ratio'] // 10
+    dd_reads = rng.randint(1000000, 3000000)
+    dd_writes = rng.randint(5000000, 7000000)
+    cd_reads = rng.randint(3000000, 5000000)
+    values.update({
+        'num_dd': 10 * params['num_mem'],
+        'memory_factory': _MEMORY_MANAGERS[params['memory_manager']],
+        'storage_factory': _STORAGE_MANAGERS[params['storage_manager']],
+        'buffer_factory': _BUFFER_MANAGERS[params['buffer_manager']],
+        'sim_time': rng.uniform(43000, 43300),
+        'energy': _number(sum(energies), 4),
+        'active': _energy_state(rng, energies[0]),
+        'idle': _energy_state(rng, energies[1]),
+        'standby': _energy_state(rng, energies[2]),
+        'spindown': _energy_state(rng, energies[3]),
+        'spinup': _energy_state(rng, energies[4]),
+        'response': rng.uniform(1, 50),
+        'requests': _number(requests),
+        'reads': _number(reads),
+        'read_blocks': _number(reads * 16),
+        'writes': _number(requests - reads),
+        'write_blocks': _number((requests - reads) * 16),
+        'mem_reads': _number(rng.randint(10000000, 30000000)),
+        'mem_read_hit': rng.random(),
+        'mem_writes': _number(rng.randint(10000000, 30000000)),
+        'dd_response': rng.uniform(1, 60),
+        'dd_accesses': _number(dd_reads + dd_writes),
+        'dd_reads': _number(dd_reads),
+        'dd_writes': _number(dd_writes),
+        'cd_response': rng.uniform(1, 60),
+        'cd_accesses': _number(cd_reads + dd_reads + dd_writes),
+        'cd_actual': _number(cd_reads + dd_writes),
+        'cd_reads': _number(cd_reads),
+        'cd_hit': rng.random(),
+        'spindowns': rng.randint(0, 1000),
+        'spinups': rng.randint(0, 1000),
+        'overflows': rng.randint(0, 1000),
+        'elapsed': _number(rng.randint(100, 5000)),
+    })
+    return _SUMMARY_TEMPLATE % values
+
+
+def generate_summaries(outdir, num_summaries, seed=_SEED):
+    '''
+    Write num_summaries summary files of the sweep into the directories
+    of their workload lambdas under outdir.
+    '''
+    rng = random.Random(seed)
+    for i in range(num_summaries):
+        params = get_sweep_params(i)
+        parent = os.path.join(outdir, 'lam%d' % params['wl_lambda'])
+        if not os.path.exists(parent):
+            os.makedirs(parent)
+        with open(os.path.join(parent, _SUMMARY_NAME % params), 'w') as f:
+            f.write(format_summary(params, rng))
+    logging.info('generated %d summary files in %s' % (num_summaries, outdir))
+
+
+def generate_trace(path, num_lines, num_disks=_NUM_DISKS, seed=_SEED):
+    '''
+    Write a DataDiskPerf.out of num_lines random accesses to num_disks
+    disks.
+    '''
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write(_TRACE_HEADER)
+        for start in range(0, num_lines, _GENERATE_LINES):
+            lines = []
+            for i in range(start, min(start + _GENERATE_LINES, num_lines)):
+                arrival = i * 0.1
+                response = rng.expovariate(2.0)
+                lines.append(_TRACE_FORMAT % (
+                    rng.randrange(num_disks), arrival, arrival,
+                    arrival + response, response, rng.choice(_TRACE_TYPES)))
+            f.write('\n'.join(lines) + '\n')
+
+
+def generate_rotation_trace(path, num_lines, num_disks=_NUM_DISKS,
+                            seed=_SEED):
+    '''
+    Write a DiskRotationRatio.out of num_lines random accesses to
+    num_disks disks.
+    '''
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write(_ROTATION_HEADER)
+        for start in range(0, num_lines, _GENERATE_LINES):
+            lines = []
+            for i in range(start, min(start + _GENERATE_LINES, num_lines)):
+                arrival = i * 0.1
+                lines.append(_ROTATION_FORMAT % (
+                    arrival, rng.randrange(1 << 30), rng.randrange(num_disks),
+                    arrival, arrival + 1.0,
+                    'true' if rng.random() < 0.66 else 'false'))
+            f.write('\n'.join(lines) + '\n')
+
+
+def prepare_data(workdir, num_summaries, num_trace_lines):
+    '''
+    Generate the summary files and the traces of the scale unless they
+    already exist, and return the directory of the summary files and the
+    directory of the traces.
+    '''
+    summary_dir = os.path.join(workdir, 'summary-%d' % num_summaries)
+    trace_dir = os.path.join(workdir, 'trace-%d' % num_trace_lines)
+    if not os.path.exists(summary_dir):
+        generate_summaries(summary_dir + '.tmp', num_summaries)
+        os.rename(summary_dir + '.tmp', summary_dir)
+    if not os.path.exists(trace_dir):
+        os.makedirs(trace_dir + '.tmp')
+        generate_trace(os.path.join(trace_dir + '.tmp', 'DataDiskPerf.out'),
+                       num_trace_lines)
+        generate_rotation_trace(
+            os.path.join(trace_dir + '.tmp', 'DiskRotationRatio.out'),
+            num_trace_lines)
+        os.rename(trace_dir + '.tmp', trace_dir)
+        logging.info('generated the traces of %d lines in %s'
+                     % (num_trace_lines, trace_dir))
+    return summary_dir, trace_dir
+
+
+class Benchmark(object):
+    '''
+    Run the stages and keep the best time of every stage over the
+    repeats.
+    '''
+
+    def __init__(self, stages, repeats=1):
+        self.stages = stages
+        self.repeats = repeats
+        self.results = {}
+
+    def run(self, stage, func, items):
+        '''
+        Time func() repeats times if the stage is selected, and return the
+        value of the last call, or None.
+        '''
+        if stage not in self.stages:
+            return None
+        best = None
+        for i in range(self.repeats):
+            started = time.time()
+            value = func()
+            elapsed = time.time() - started
+            best = elapsed if best is None else min(best, elapsed)
+        n = items(value) if callable(items) else items
+        self.results[stage] = {'seconds': best, 'items': n}
+        logging.info('%-10s %10.3f s %12d items %14.1f items/s'
+                     % (stage, best, n, n / max(best, 1e-9)))
+        return value
+
+
+def run_awk(script, path):
+    with open(os.devnull, 'w') as devnull:
+        subprocess.check_call(['awk', '-f', script, path], stdout=devnull)
+
+
+def run_benchmarks(workdir, num_summaries, num_trace_lines, stages,
+                   num_workers=1, repeats=1):
+    '''
+    Run the stages on the data of the scale and return the results which
+    map the stages to their best times and numbers of items.
+    '''
+    summary_dir, trace_dir = prepare_data(workdir, num_summaries,
+                                          num_trace_lines)
+    trace = os.path.join(trace_dir, 'DataDiskPerf.out')
+    rotation = os.path.join(trace_dir, 'DiskRotationRatio.out')
+    awk_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           os.pardir, 'awk')
+    bench = Benchmark(stages, repeats)
+
+    def scan():
+        return list(asmgraph.generate_file_paths(summary_dir, None,
+                                                 asmgraph._num_walkers))
+
+    def parse():
+        return asmgraph.parse_sim_results(paths, num_workers)
+
+    # the stages which are not selected are still run once if the later
+    # stages need their results
+    paths = bench.run('scan', scan, len) or scan()
+    bench.run('filter', lambda: [p for p in paths
+                                 if asmgraph.test_condition(p)], len(paths))
+
+    objs = []
+    if set(stages) & set(('parse', 'table', 'render')):
+        objs = bench.run('parse', parse, len(paths)) or parse()
+    bench.run('table', lambda: asmgraph.build_result_table(objs), len(objs))
+
+    # the figures of the runs of one workload lambda, like a plot of
+    # asmgraph.py -COND
+    group = [obj for obj in objs if '.lam30.' in obj.path]
+    asmgraph._to_plot_list = [p for p in asmgraph._PLOT_TYPE if p != 'tail']
+    asmgraph._output_dir = os.path.join(workdir, 'figures')
+    asmgraph._file_formats = ['png']
+    tasks = asmgraph.get_render_tasks(group)
+    bench.run('render', lambda: asmgraph.render_figures(
+        tasks, num_workers, True), len(tasks))
+
+    # the trace stage times the CSV reader, which diskperf skips for the
+    # columnar copy next to the trace, so the copy is converted elsewhere
+    cols_dir = os.path.join(workdir, 'cols-%d' % num_trace_lines)
+    if os.path.exists(tracecols.get_columns_dir(trace)):
+        logging.info('removing ' + tracecols.get_columns_dir(trace))
+        shutil.rmtree(tracecols.get_columns_dir(trace))
+    bench.run('trace', lambda: diskperf.calc_disk_performance(
+        [trace], num_workers=num_workers), num_trace_lines)
+    if 'trace_awk' in stages and not _has_awk():
+        logging.warning('awk is not found')
+    elif 'trace_awk' in stages:
+        bench.run('trace_awk', lambda: run_awk(
+            os.path.join(awk_dir, 'calcDiskPerformance.awk'), trace),
+            num_trace_lines)
+    if 'trace_cols' in stages or 'convert' in stages:
+        if (bench.run('convert', lambda: tracecols.convert(trace, cols_dir),
+                      num_trace_lines) is None):
+            tracecols.convert(trace, cols_dir)
+        bench.run('trace_cols', lambda: diskperf.calc_disk_performance(
+            [cols_dir], num_workers=num_workers), num_trace_lines)
+    bench.run('rotation', lambda: diskperf.calc_rotation_ratio(
+        [rotation], num_workers=num_workers), num_trace_lines)
+    return bench.results
+
+
+def _has_awk():
+    try:
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(['awk', 'BEGIN {}'], stdout=devnull)
+        return True
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+
+def get_commit():
+    '''
+    Return the git commit of the working tree, or None.
+    '''
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'], stderr=devnull,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(path, results, scale, num_workers):
+    report = {
+        'commit': get_commit(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'cpus': multiprocessing.cpu_count(),
+        'workers': num_workers,
+        'scale': scale,
+        'stages': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+
+
+def format_comparison(baseline, report):
+    '''
+    Return the lines of the table which compares the times of the stages
+    of two reports of save_results.
+    '''
+    lines = ['%-10s %10s %10s %8s' % ('stage', baseline.get('commit'),
+                                      report.get('commit'), 'ratio')]
+    if baseline.get('scale') != report.get('scale'):
+        lines.append('warning: the scales differ: %s, %s'
+                     % (baseline.get('scale'), report.get('scale')))
+    for stage in _STAGES:
+        if stage not in baseline['stages'] or stage not in report['stages']:
+            continue
+        old = baseline['stages'][stage]['seconds']
+        new = report['stages'][stage]['seconds']
+        lines.append('%-10s %10.3f %10.3f %8.2f'
+                     % (stage, old, new, new / max(old, 1e-9)))
+    return lines
+
+
+def print_usage(command_name):
+    sys.stdout.write('''
+Usage:
+
+python %s [-W<dir>] [-N<n>] [-L<n>] [-j[n]] [-R<n>] [-S<stage>[,<stage>...]] \
+[-O<file>] [-B<file>]
+
+  Time the stages of asmgraph.py, diskperf.py and the awk scripts on a
+  synthetic sweep.
+
+  -W<dir>   generate the data into <dir>. (default: %s)
+  -N<n>     number of the summary files. (default: %d)
+  -L<n>     number of the lines of the traces. (default: %d)
+  -j[n]     parse, render and count the traces with n worker processes.
+            n defaults to the number of CPUs.
+  -R<n>     run every stage n times and keep the best time. (default: 1)
+  -S<stage>[,<stage>...]
+            run only the stages of %s.
+  -O<file>  write the results to <file>. (default: %s)
+  -B<file>  compare the results with the results of another run in <file>.
+''' % (command_name, _WORK_DIR, _NUM_SUMMARIES, _NUM_TRACE_LINES,
+       ', '.join(_STAGES), _RESULT_FILE))
+
+
+def main(args):
+    workdir = _WORK_DIR
+    num_summaries = _NUM_SUMMARIES
+    num_trace_lines = _NUM_TRACE_LINES
+    num_workers = 1
+    repeats = 1
+    stages = _STAGES
+    result_file = _RESULT_FILE
+    baseline_file = None
+    for item in args:
+        if item.startswith('-W'):
+            workdir = item[2:]
+        elif item.startswith('-N'):
+            num_summaries = int(item[2:])
+        elif item.startswith('-L'):
+            num_trace_lines = int(item[2:])
+        elif item.startswith('-j'):
+            if item[2:]:
+                num_workers = int(item[2:])
+            else:
+                num_workers = multiprocessing.cpu_count()
+        elif item.startswith('-R'):
+            repeats = int(item[2:])
+        elif item.startswith('-S'):
+            stages = [s for s in item[2:].split(',') if s in _STAGES]
+        elif item.startswith('-O'):
+            result_file = item[2:]
+        elif item.startswith('-B'):
+            baseline_file = item[2:]
+
+    results = run_benchmarks(workdir, num_summaries, num_trace_lines,
+                             stages, num_workers, repeats)
+    scale = {'summaries': num_summaries, 'trace_lines': num_trace_lines}
+    save_results(result_file, results, scale, num_workers)
+
+    if baseline_file:
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+        with open(result_file) as f:
+            report = json.load(f)
+        for line in format_comparison(baseline, report):
+            sys.stdout.write(line + '\n')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] in ('-h', '-help'):
+        print_usage(sys.argv[0])
+        exit()
+
+    main(sys.argv[1:])
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+import io
+import os
+import bz2
+import gzip
+import zlib
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+'''
+Reading of the compressed summary files and disk traces.
+
+The compression of a file is given by the suffix of its name, which is
+one of _SUFFIXES. The files are decompressed as streams while they are
+read, so they are never unpacked on the disk. .xz needs the lzma module
+(backports.lzma on Python 2) and .zst needs the zstandard module.
+'''
+
+_SUFFIXES = ('.gz', '.bz2', '.xz', '.zst')
+_CHUNK_SIZE = 1 << 20
+
+# errors of reading a corrupt or truncated compressed file
+DECOMPRESS_ERRORS = ((IOError, EOFError, zlib.error)
+                     + ((lzma.LZMAError,) if lzma is not None else ())
+                     + ((zstandard.ZstdError,) if zstandard is not None
+                        else ()))
+
+
+class MissingModuleError(IOError):
+    '''
+    The module to decompress the file is not installed.
+    '''
+    pass
+
+
+def get_suffix(path):
+    '''
+    Return the compression suffix of the path, or '' if it is not
+    compressed.
+    '''
+    for suffix in _SUFFIXES:
+        if path.endswith(suffix):
+            return suffix
+    return ''
+
+
+def is_compressed(path):
+    return get_suffix(path) != ''
+
+
+def strip_suffix(path):
+    '''
+    Return the path without its compression suffix.
+    '''
+    return path[:len(path) - len(get_suffix(path))]
+
+
+def find_file(path):
+    '''
+    Return the path if it exists, or the path of its first compressed
+    variant which exists, or None.
+    '''
+    for candidate in (path,) + tuple(path + s for s in _SUFFIXES):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def open_file(path):
+    '''
+    Open the file of the path for reading, decompressing it by the
+    suffix of the path.
+    '''
+    suffix = get_suffix(path)
+    if suffix == '':
+        return open(path, 'r')
+    if suffix == '.gz':
+        return gzip.open(path, 'rb')
+    if suffix == '.bz2':
+        return bz2.BZ2File(path, 'rb')
+    if suffix == '.xz':
+        if lzma is None:
+            raise MissingModuleError('no lzma module to read ' + path)
+        return lzma.open(path, 'rb')
+    if zstandard is None:
+        raise MissingModuleError('no zstandard module to read ' + path)
+    reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+    return io.BufferedReader(reader)
+
+
+def read_tail(path, size):
+    '''
+    Return the last size bytes of the decompressed contents of the file.
+    The file is read as a stream, so only the tail is kept in memory.
+    '''
+    tail = b''
+    with open_file(path) as f:
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            tail = (tail + chunk)[-size:]
+    return tail
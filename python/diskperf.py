@@ -0,0 +1,907 @@
+#!/usr/bin/env python
+
+import sys
+import functools
+import multiprocessing
+
+import numpy as np
+
+from tracecols import read_chunks, split_fields, to_array, open_trace
+from tracecols import get_shards
+from compressed import open_file, is_compressed
+
+'''
+Per-disk access performance of the disk traces.
+
+This is the same aggregation as awk/calcDiskPerformance.awk for
+CacheDiskPerf.out and DataDiskPerf.out. The traces are CSV files with a
+header line, and the disk id, the response time and the operation type
+are in the 1st, the 5th and the 6th columns. The traces are read in
+chunks of a fixed size and the counts and the sums of the response
+times are accumulated with numpy.bincount, so the memory does not grow
+with the size of the trace.
+
+The response times are also counted in histograms of logarithmic
+buckets per disk and operation type. The histograms have a fixed size
+and they can be merged by adding them, so the percentiles of many traces
+are computed in one pass with the relative error of the bucket width.
+'''
+
+# operation types in the 6th column. the others are counted only in cnt.
+_OP_TYPES = ('READ', 'WRITE', 'BG_WRITE')
+_OP_PREFIXES = ('rd', 'wt', 'bgw')
+
+_DISKID_COLUMN = 0
+_ARRIVAL_COLUMN = 1
+_RESPONSE_COLUMN = 4
+_OP_COLUMN = 5
+
+# columns of DiskRotationRatio.out
+_ROTATION_TIME_COLUMN = 0
+_ROTATION_DISKID_COLUMN = 2
+_ROTATION_FLAG_COLUMN = 5
+
+# seconds of a window of the time series
+_WINDOW = 60.0
+# a key of a time series cell is (window << _WINDOW_SHIFT | diskid << 3 | op)
+_WINDOW_SHIFT = 32
+
+_CHUNK_SIZE = 16 * 1024 * 1024
+# rows of a columnar trace which are aggregated at once
+_CHUNK_ROWS = 1024 * 1024
+
+# the buckets of the histograms. bucket 0 holds the response times up to
+# _MIN_RESPONSE and the last bucket the ones over _MAX_RESPONSE, and the
+# other buckets are 10 ** (1.0 / _BUCKETS_PER_DECADE) wide (about 4.7%).
+_MIN_RESPONSE = 1e-6
+_MAX_RESPONSE = 1e4
+_BUCKETS_PER_DECADE = 50
+_NUM_BUCKETS = 2 + _BUCKETS_PER_DECADE * int(
+    round(np.log10(_MAX_RESPONSE / _MIN_RESPONSE)))
+
+_QUANTILES = (0.5, 0.95, 0.99, 0.999)
+_QUANTILE_NAMES = ('p50', 'p95', 'p99', 'p999')
+
+'''
+Columns of the performance table
+--------------------------------
+(column name, dtype)
+'''
+_PERF_COLUMNS = (
+    ('diskid', 'i4'),
+    ('rdcnt', 'i8'),
+    ('rdavgresp', 'f8'),
+    ('wtcnt', 'i8'),
+    ('wtavgresp', 'f8'),
+    ('bgwcnt', 'i8'),
+    ('bgwavgresp', 'f8'),
+    ('cnt', 'i8'),
+    ('avgresp', 'f8'),
+)
+
+_PERF_FORMAT = ('diskid:%04d\trdcnt:%d\trdavgresp:%.8f\twtcnt:%d\twtavgresp:%.8f'
+                '\tbgwcnt:%d\tbgwavgresp:%.8f\tcnt:%d\tavgresp:%.8f')
+
+'''
+Columns of the percentile table
+-------------------------------
+(column name, dtype)
+The op column is one of _OP_TYPES, 'OTHER' or 'ALL'.
+'''
+_PERCENTILE_COLUMNS = (
+    ('diskid', 'i4'),
+    ('op', 'S8'),
+    ('cnt', 'i8'),
+) + tuple((name, 'f8') for name in _QUANTILE_NAMES)
+
+_PERCENTILE_FORMAT = ('diskid:%04d\top:%s\tcnt:%d\t'
+                      + '\t'.join(name + ':%.8f' for name in _QUANTILE_NAMES))
+
+_HISTOGRAM_FORMAT = 'diskid:%04d\top:%s\tle:%.8g\tcnt:%d'
+
+_WINDOW_FORMAT = ('time:%.3f\tdiskid:%04d\top:%s\tcnt:%d\tavgresp:%.8f'
+                  '\tmaxresp:%.8f')
+_ROTATION_WINDOW_FORMAT = ('time:%.3f\tdiskid:%04d\thit:%d\tmiss:%d'
+                           '\thit ratio:%.4f')
+
+# per-window series of the runs of get_series, which are the sums over
+# all the disks and the operation types
+_SERIES = ('count', 'avgresp', 'maxresp', 'hitratio')
+
+# matrices of get_disk_matrices, which have one row per run and one
+# column per disk id
+_DISK_MATRICES = ('count', 'avgresp', 'hitratio')
+
+
+def get_bucket_ids(responses):
+    '''
+    Return the bucket ids of the histogram for the response times.
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ids = np.floor(np.log10(responses / _MIN_RESPONSE)
+                       * _BUCKETS_PER_DECADE) + 1
+    ids[~(responses > _MIN_RESPONSE)] = 0
+    return np.minimum(ids, _NUM_BUCKETS - 1).astype(np.int64)
+
+
+def get_bucket_bounds():
+    '''
+    Return the upper bounds of the buckets of the histogram. The last
+    one is infinity.
+    '''
+    bounds = _MIN_RESPONSE * 10 ** (
+        np.arange(_NUM_BUCKETS, dtype=np.float64) / _BUCKETS_PER_DECADE)
+    bounds[-1] = np.inf
+    return bounds
+
+
+def get_percentiles(hist, quantiles=_QUANTILES):
+    '''
+    Return the percentiles of the histograms in the last axis of hist as
+    an array of the shape of hist.shape[:-1] + (len(quantiles),). The
+    value of a bucket is the geometric mean of its bounds, and the
+    percentiles of the empty histograms are 0.
+    '''
+    bounds = get_bucket_bounds()
+    values = np.empty(_NUM_BUCKETS)
+    values[0] = _MIN_RESPONSE
+    values[1:-1] = np.sqrt(bounds[:-2] * bounds[1:-1])
+    values[-1] = _MAX_RESPONSE
+
+    cum = np.cumsum(hist, axis=-1)
+    total = cum[..., -1:]
+    result = np.zeros(hist.shape[:-1] + (len(quantiles),))
+    for i, q in enumerate(quantiles):
+        # the first bucket where the cumulative count reaches q of total
+        ids = (cum < np.ceil(total * q)).sum(axis=-1)
+        result[..., i] = np.where(total[..., 0] > 0,
+                                  values[np.minimum(ids, _NUM_BUCKETS - 1)], 0)
+    return result
+
+
+def parse_chunk(chunk, num_columns):
+    '''
+    Return the arrays of the disk ids, the response times and the
+    operation types of the lines of the chunk.
+    '''
+    fields = split_fields(chunk, num_columns)
+    return (to_array(fields[_DISKID_COLUMN::num_columns], np.int64),
+            to_array(fields[_RESPONSE_COLUMN::num_columns], np.float64),
+            np.array(fields[_OP_COLUMN::num_columns]))
+
+
+class DiskPerfCounter(object):
+    '''
+    Accumulate the access counts, the sums of the response times and the
+    histograms of the response times per disk id and operation type.
+    '''
+
+    def __init__(self):
+        # rows are the disk ids, columns are _OP_TYPES and the others
+        width = len(_OP_TYPES) + 1
+        self.counts = np.zeros((0, width), dtype=np.int64)
+        self.sums = np.zeros((0, width), dtype=np.float64)
+        self.hist = np.zeros((0, width, _NUM_BUCKETS), dtype=np.int64)
+
+    def add(self, diskids, responses, ops):
+        '''
+        Add the accesses given as the arrays of the disk ids, the
+        response times and the operation types.
+        '''
+        opids = np.empty(len(ops), dtype=np.int64)
+        opids.fill(len(_OP_TYPES))
+        for i, op in enumerate(_OP_TYPES):
+            opids[ops == op] = i
+        self.add_opids(diskids, responses, opids)
+
+    def add_opids(self, diskids, responses, opids):
+        '''
+        Add the accesses whose operation types are given as the indexes of
+        _OP_TYPES, or len(_OP_TYPES) for the others.
+        '''
+        if len(diskids) == 0:
+            return
+        width = len(_OP_TYPES) + 1
+        diskids = np.asarray(diskids, dtype=np.int64)
+        num_disks = max(len(self.counts), int(diskids.max()) + 1)
+        keys = diskids * width + opids
+        counts = np.bincount(keys, minlength=num_disks * width)
+        sums = np.bincount(keys, weights=responses,
+                           minlength=num_disks * width)
+        hist = np.bincount(keys * _NUM_BUCKETS + get_bucket_ids(responses),
+                           minlength=num_disks * width * _NUM_BUCKETS)
+        self._grow(num_disks)
+        self.counts += counts.reshape(num_disks, width)
+        self.sums += sums.reshape(num_disks, width)
+        self.hist += hist.reshape(num_disks, width, _NUM_BUCKETS)
+
+    def merge(self, other):
+        '''
+        Add the accesses counted by another DiskPerfCounter.
+        '''
+        num_disks = len(other.counts)
+        self._grow(num_disks)
+        self.counts[:num_disks] += other.counts
+        self.sums[:num_disks] += other.sums
+        self.hist[:num_disks] += other.hist
+
+    def _grow(self, num_disks):
+        grow = num_disks - len(self.counts)
+        if grow > 0:
+            self.counts = _grow_rows(self.counts, grow)
+            self.sums = _grow_rows(self.sums, grow)
+            self.hist = _grow_rows(self.hist, grow)
+
+    def add_chunk(self, chunk, num_columns):
+        '''
+        Add the accesses of the lines of a CSV trace.
+        '''
+        self.add(*parse_chunk(chunk, num_columns))
+
+    def add_rows(self, trace, start, end):
+        '''
+        Add the accesses of the rows of a tracecols.ColumnarTrace.
+        '''
+        opids = trace.lookup(_OP_COLUMN, _OP_TYPES, len(_OP_TYPES))
+        self.add_opids(trace.column(_DISKID_COLUMN)[start:end],
+                       trace.column(_RESPONSE_COLUMN)[start:end],
+                       opids[trace.column(_OP_COLUMN)[start:end]])
+
+    def get_table(self):
+        '''
+        Return the performance as a numpy structured array of
+        _PERF_COLUMNS which has one row per accessed disk, in the order of
+        the disk ids.
+        '''
+        total_counts = self.counts.sum(axis=1)
+        total_sums = self.sums.sum(axis=1)
+        diskids = np.nonzero(total_counts)[0]
+
+        table = np.zeros(len(diskids), dtype=list(_PERF_COLUMNS))
+        table['diskid'] = diskids
+        for i, prefix in enumerate(_OP_PREFIXES):
+            table[prefix + 'cnt'] = self.counts[diskids, i]
+            table[prefix + 'avgresp'] = _average(
+                self.sums[diskids, i], self.counts[diskids, i])
+        table['cnt'] = total_counts[diskids]
+        table['avgresp'] = _average(total_sums[diskids], total_counts[diskids])
+        return table
+
+    def get_histogram(self, op=None):
+        '''
+        Return the histogram of all the disks for one of _OP_TYPES, or
+        for all of the accesses when op is None.
+        '''
+        hist = self.hist.sum(axis=0)
+        if op is None:
+            return hist.sum(axis=0)
+        return hist[_OP_TYPES.index(op)]
+
+    def get_percentile_table(self):
+        '''
+        Return the percentiles as a numpy structured array of
+        _PERCENTILE_COLUMNS which has one row per accessed disk and
+        operation type, and one row per accessed disk for all of them.
+        '''
+        ops = _OP_TYPES + ('OTHER', 'ALL')
+        hist = np.concatenate(
+            (self.hist, self.hist.sum(axis=1)[:, np.newaxis]), axis=1)
+        counts = hist.sum(axis=2)
+        percentiles = get_percentiles(hist)
+
+        diskids, opids = np.nonzero(counts)
+        table = np.zeros(len(diskids), dtype=list(_PERCENTILE_COLUMNS))
+        table['diskid'] = diskids
+        table['op'] = np.array(ops)[opids]
+        table['cnt'] = counts[diskids, opids]
+        for i, name in enumerate(_QUANTILE_NAMES):
+            table[name] = percentiles[diskids, opids, i]
+        return table
+
+    def format_histogram(self):
+        '''
+        Return the lines of the non-empty buckets of the histograms.
+        '''
+        ops = _OP_TYPES + ('OTHER',)
+        bounds = get_bucket_bounds()
+        return [_HISTOGRAM_FORMAT % (d, ops[o], bounds[b], self.hist[d, o, b])
+                for d, o, b in zip(*np.nonzero(self.hist))]
+
+
+def _grow_rows(a, grow):
+    return np.concatenate((a, np.zeros((grow,) + a.shape[1:], dtype=a.dtype)))
+
+
+def _average(sums, counts):
+    return np.where(counts > 0, sums / np.maximum(counts, 1), 0.0)
+
+
+class RotationCounter(object):
+    '''
+    Accumulate the numbers of the accesses to the rotating disks (hit)
+    and to the others (miss) per disk id in DiskRotationRatio.out.
+    '''
+
+    def __init__(self):
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.misses = np.zeros(0, dtype=np.int64)
+
+    def add(self, diskids, flags):
+        '''
+        Add the accesses given as the arrays of the disk ids and the
+        booleans whether the disks were rotating.
+        '''
+        if len(diskids) == 0:
+            return
+        diskids = np.asarray(diskids, dtype=np.int64)
+        num_disks = max(len(self.hits), int(diskids.max()) + 1)
+        self._grow(num_disks)
+        self.hits += np.bincount(diskids[flags], minlength=num_disks)
+        self.misses += np.bincount(diskids[~flags], minlength=num_disks)
+
+    def merge(self, other):
+        num_disks = len(other.hits)
+        self._grow(num_disks)
+        self.hits[:num_disks] += other.hits
+        self.misses[:num_disks] += other.misses
+
+    def _grow(self, num_disks):
+        grow = num_disks - len(self.hits)
+        if grow > 0:
+            self.hits = _grow_rows(self.hits, grow)
+            self.misses = _grow_rows(self.misses, grow)
+
+    def add_chunk(self, chunk, num_columns):
+        fields = split_fields(chunk, num_columns)
+        self.add(to_array(fields[_ROTATION_DISKID_COLUMN::num_columns],
+                          np.int64),
+                 np.array(fields[_ROTATION_FLAG_COLUMN::num_columns])
+                 == 'true')
+
+    def add_rows(self, trace, start, end):
+        codes = trace.column(_ROTATION_FLAG_COLUMN)[start:end]
+        flags = trace.lookup(_ROTATION_FLAG_COLUMN, ['true']) == 0
+        self.add(trace.column(_ROTATION_DISKID_COLUMN)[start:end],
+                 flags[codes])
+
+    def get_table(self):
+        '''
+        Return a numpy structured array of the disk id, hit, miss and the
+        hit ratio which has one row per accessed disk.
+        '''
+        totals = self.hits + self.misses
+        diskids = np.nonzero(totals)[0]
+        table = np.zeros(len(diskids), dtype=[
+            ('diskid', 'i4'), ('hit', 'i8'), ('miss', 'i8'), ('ratio', 'f8')])
+        table['diskid'] = diskids
+        table['hit'] = self.hits[diskids]
+        table['miss'] = self.misses[diskids]
+        table['ratio'] = self.hits[diskids] / totals[diskids].astype(float)
+        return table
+
+
+def _reduce_keys(keys, values, reducers):
+    '''
+    Return the unique keys and the values of the same keys reduced by the
+    numpy ufuncs of reducers.
+    '''
+    if len(keys) == 0:
+        return keys, values
+    order = np.argsort(keys, kind='mergesort')
+    keys = keys[order]
+    starts = np.concatenate(([0], np.nonzero(np.diff(keys))[0] + 1))
+    return keys[starts], [r.reduceat(v[order], starts)
+                          for v, r in zip(values, reducers)]
+
+
+class _WindowCounter(object):
+    '''
+    Base class of the counters of the time series, which accumulate the
+    values per window of window seconds and disk id, and per operation
+    type for the accesses. Only the cells which have a record are kept,
+    so the memory grows with the number of the busy cells and not with
+    the length of the trace. The reducers of the values are given by
+    _REDUCERS of the subclass.
+    '''
+
+    _REDUCERS = ()
+
+    def __init__(self, window=_WINDOW):
+        self.window = window
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.values = [np.zeros(0) for r in self._REDUCERS]
+
+    def _add(self, times, keys, values):
+        if len(keys) == 0:
+            return
+        windows = np.floor(np.asarray(times) / self.window).astype(np.int64)
+        keys = (windows << _WINDOW_SHIFT) | keys
+        keys, values = _reduce_keys(keys, values, self._REDUCERS)
+        self._merge(keys, values)
+
+    def _merge(self, keys, values):
+        self.keys, self.values = _reduce_keys(
+            np.concatenate((self.keys, keys)),
+            [np.concatenate((a, b)) for a, b in zip(self.values, values)],
+            self._REDUCERS)
+
+    def merge(self, other):
+        self._merge(other.keys, other.values)
+
+    def get_windows(self):
+        return self.keys >> _WINDOW_SHIFT
+
+    def _sum_windows(self, values, minlength=0):
+        '''
+        Return the sums of the values per window from the window 0.
+        '''
+        return np.bincount(self.get_windows(), weights=values,
+                           minlength=minlength)
+
+
+class WindowPerfCounter(_WindowCounter):
+    '''
+    Accumulate the access counts, the sums and the maximums of the
+    response times per window, disk id and operation type of
+    DataDiskPerf.out or CacheDiskPerf.out. The window of an access is
+    given by its arrival time.
+    '''
+
+    _REDUCERS = (np.add, np.add, np.maximum)
+
+    def add_opids(self, arrivals, diskids, responses, opids):
+        diskids = np.asarray(diskids, dtype=np.int64)
+        responses = np.asarray(responses, dtype=np.float64)
+        keys = (diskids << 3) | np.asarray(opids, dtype=np.int64)
+        self._add(arrivals, keys,
+                  [np.ones(len(keys)), responses, responses])
+
+    def add_chunk(self, chunk, num_columns):
+        fields = split_fields(chunk, num_columns)
+        ops = np.array(fields[_OP_COLUMN::num_columns])
+        opids = np.empty(len(ops), dtype=np.int64)
+        opids.fill(len(_OP_TYPES))
+        for i, op in enumerate(_OP_TYPES):
+            opids[ops == op] = i
+        self.add_opids(
+            to_array(fields[_ARRIVAL_COLUMN::num_columns], np.float64),
+            to_array(fields[_DISKID_COLUMN::num_columns], np.int64),
+            to_array(fields[_RESPONSE_COLUMN::num_columns], np.float64),
+            opids)
+
+    def add_rows(self, trace, start, end):
+        opids = trace.lookup(_OP_COLUMN, _OP_TYPES, len(_OP_TYPES))
+        self.add_opids(trace.column(_ARRIVAL_COLUMN)[start:end],
+                       trace.column(_DISKID_COLUMN)[start:end],
+                       trace.column(_RESPONSE_COLUMN)[start:end],
+                       opids[trace.column(_OP_COLUMN)[start:end]])
+
+    def get_table(self):
+        '''
+        Return a numpy structured array of the start time of the window,
+        the disk id, the operation type, the count and the average and
+        the maximum response times, which has one row per window, disk
+        and operation type with accesses in the order of them.
+        '''
+        counts, sums, maxs = self.values
+        table = np.zeros(len(self.keys), dtype=[
+            ('time', 'f8'), ('diskid', 'i4'), ('op', 'S8'), ('cnt', 'i8'),
+            ('avgresp', 'f8'), ('maxresp', 'f8')])
+        table['time'] = self.get_windows() * self.window
+        table['diskid'] = (self.keys & ((1 << _WINDOW_SHIFT) - 1)) >> 3
+        table['op'] = np.array(_OP_TYPES + ('OTHER',))[self.keys & 7]
+        table['cnt'] = counts
+        table['avgresp'] = _average(sums, counts)
+        table['maxresp'] = maxs
+        return table
+
+    def get_series(self, num_windows=0):
+        '''
+        Return the access counts, the average and the maximum response
+        times of all the disks per window from the window 0.
+        '''
+        counts, sums, maxs = self.values
+        windows = self.get_windows()
+        num_windows = max(num_windows,
+                          int(windows.max()) + 1 if len(windows) else 0)
+        counts = self._sum_windows(counts, num_windows)
+        maxresp = np.zeros(num_windows)
+        np.maximum.at(maxresp, windows, maxs)
+        return counts, _average(self._sum_windows(sums, num_windows),
+                                counts), maxresp
+
+
+class WindowRotationCounter(_WindowCounter):
+    '''
+    Accumulate the numbers of the accesses to the rotating disks and of
+    all the accesses per window and disk id of DiskRotationRatio.out.
+    '''
+
+    _REDUCERS = (np.add, np.add)
+
+    def add(self, times, diskids, flags):
+        diskids = np.asarray(diskids, dtype=np.int64)
+        self._add(times, diskids << 3,
+                  [np.asarray(flags, dtype=np.float64),
+                   np.ones(len(diskids))])
+
+    def add_chunk(self, chunk, num_columns):
+        fields = split_fields(chunk, num_columns)
+        self.add(to_array(fields[_ROTATION_TIME_COLUMN::num_columns],
+                          np.float64),
+                 to_array(fields[_ROTATION_DISKID_COLUMN::num_columns],
+                          np.int64),
+                 np.array(fields[_ROTATION_FLAG_COLUMN::num_columns])
+                 == 'true')
+
+    def add_rows(self, trace, start, end):
+        codes = trace.column(_ROTATION_FLAG_COLUMN)[start:end]
+        flags = trace.lookup(_ROTATION_FLAG_COLUMN, ['true']) == 0
+        self.add(trace.column(_ROTATION_TIME_COLUMN)[start:end],
+                 trace.column(_ROTATION_DISKID_COLUMN)[start:end],
+                 flags[codes])
+
+    def get_table(self):
+        '''
+        Return a numpy structured array of the start time of the window,
+        the disk id, hit, miss and the hit ratio, which has one row per
+        window and accessed disk.
+        '''
+        hits, totals = self.values
+        table = np.zeros(len(self.keys), dtype=[
+            ('time', 'f8'), ('diskid', 'i4'), ('hit', 'i8'), ('miss', 'i8'),
+            ('ratio', 'f8')])
+        table['time'] = self.get_windows() * self.window
+        table['diskid'] = (self.keys & ((1 << _WINDOW_SHIFT) - 1)) >> 3
+        table['hit'] = hits
+        table['miss'] = totals - hits
+        table['ratio'] = hits / totals
+        return table
+
+    def get_series(self, num_windows=0):
+        '''
+        Return the rotation hit ratios of all the disks per window from
+        the window 0, which are NaN for the windows without records.
+        '''
+        hits, totals = self.values
+        windows = self.get_windows()
+        num_windows = max(num_windows,
+                          int(windows.max()) + 1 if len(windows) else 0)
+        hits = self._sum_windows(hits, num_windows)
+        totals = self._sum_windows(totals, num_windows)
+        return np.where(totals > 0, hits / np.maximum(totals, 1), np.nan)
+
+
+def get_series(counters):
+    '''
+    Return a dictionary of the series of _SERIES of the WindowPerfCounter
+    and the WindowRotationCounter of a run, which have the same number
+    of windows.
+    '''
+    perf, rotation = counters
+    num_windows = max([0] + [int(c.get_windows().max()) + 1
+                             for c in counters if len(c.keys)])
+    counts, avgresp, maxresp = perf.get_series(num_windows)
+    return {
+        'count': counts.astype(np.int64),
+        'avgresp': avgresp,
+        'maxresp': maxresp,
+        'hitratio': rotation.get_series(num_windows),
+    }
+
+
+def _count_shard(task):
+    '''
+    Count a shard of a trace with a new counter and return the counter.
+    The task is a tuple of the counter class, the path of the trace, the
+    range of the shard and the chunk size. The range is the rows of a
+    columnar trace, or the byte offsets of a CSV trace, or None for a
+    whole compressed trace.
+    '''
+    counter_class, path, columnar, start, end, chunk_size = task
+    counter = counter_class()
+    if columnar:
+        trace = open_trace(path)
+        for s in range(start, end, _CHUNK_ROWS):
+            counter.add_rows(trace, s, min(s + _CHUNK_ROWS, end))
+        return counter
+    with open_file(path) as f:
+        num_columns = len(f.readline().split(','))
+        if start is not None:
+            f.seek(start)
+        for chunk in read_chunks(f, chunk_size, end):
+            counter.add_chunk(chunk, num_columns)
+    return counter
+
+
+def get_shard_tasks(counter_class, path, chunk_size=_CHUNK_SIZE,
+                    num_shards=1):
+    '''
+    Return the tasks of _count_shard which split the trace of the path
+    into at most num_shards shards. A compressed trace cannot be split,
+    so it is one shard.
+    '''
+    trace = open_trace(path)
+    if trace is not None:
+        rows = len(trace)
+        n = max(1, min(num_shards, rows // _CHUNK_ROWS))
+        bounds = [rows * i // n for i in range(n + 1)]
+        return [(counter_class, trace.path, True, s, e, chunk_size)
+                for s, e in zip(bounds[:-1], bounds[1:])]
+    if is_compressed(path):
+        return [(counter_class, path, False, None, None, chunk_size)]
+    return [(counter_class, path, False, s, e, chunk_size)
+            for s, e in get_shards(path, num_shards)]
+
+
+def count_shards(tasks, num_workers=1):
+    '''
+    Return the counters of the tasks of _count_shard, which are counted by
+    a pool of worker processes if num_workers is greater than 1.
+    '''
+    if num_workers <= 1 or len(tasks) < 2:
+        return [_count_shard(task) for task in tasks]
+    pool = multiprocessing.Pool(num_workers)
+    try:
+        return pool.map(_count_shard, tasks, 1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def count_traces(counter_class, paths, chunk_size=_CHUNK_SIZE, num_workers=1):
+    '''
+    Count the traces of the paths with counter_class and return the
+    counter. If num_workers is greater than 1 every trace is split into
+    num_workers shards which are counted by a pool of worker processes,
+    and their counters are merged. A compressed trace cannot be split,
+    so it is one shard, and the compressed traces are decompressed by
+    the workers in parallel.
+    '''
+    tasks = []
+    for path in paths:
+        tasks.extend(get_shard_tasks(counter_class, path, chunk_size,
+                                     num_workers))
+
+    counter = counter_class()
+    for c in count_shards(tasks, num_workers):
+        counter.merge(c)
+    return counter
+
+
+def count_sweep(runs, chunk_size=_CHUNK_SIZE, num_workers=1,
+                counter_classes=(DiskPerfCounter, RotationCounter)):
+    '''
+    Count the traces of all the runs of a sweep in one pass and return
+    the list of the pairs of the counters of counter_classes of every
+    run, which are the DiskPerfCounter and the RotationCounter unless
+    they are given. A run is a tuple of the paths of its disk traces and
+    the paths of its DiskRotationRatio.out. The shards of all the traces
+    are counted by one pool of worker processes, so the workers are kept
+    busy across the runs, and the traces are split only when there are
+    fewer runs than workers.
+    '''
+    num_shards = max(1, num_workers // max(1, len(runs)))
+    tasks = []
+    owners = [] # (run index, 0 for the performance or 1 for the rotation)
+    for i, (perf_paths, rotation_paths) in enumerate(runs):
+        for kind, (counter_class, paths) in enumerate(
+                zip(counter_classes, (perf_paths, rotation_paths))):
+            for path in paths:
+                shards = get_shard_tasks(counter_class, path, chunk_size,
+                                         num_shards)
+                tasks.extend(shards)
+                owners.extend([(i, kind)] * len(shards))
+
+    counters = [tuple(c() for c in counter_classes) for run in runs]
+    for (i, kind), c in zip(owners, count_shards(tasks, num_workers)):
+        counters[i][kind].merge(c)
+    return counters
+
+
+def get_disk_matrices(counters):
+    '''
+    Return a dictionary of the matrices of _DISK_MATRICES of the counters
+    of count_sweep. The rows are the runs and the columns are the disk
+    ids up to the largest one of the sweep. count is the number of the
+    accesses, avgresp is their average response time and hitratio is
+    the ratio of the accesses to the rotating disks, which is NaN for the
+    disks without the records in DiskRotationRatio.out.
+    '''
+    num_disks = max([0] + [max(len(perf.counts), len(rotation.hits))
+                           for perf, rotation in counters])
+    shape = (len(counters), num_disks)
+    counts = np.zeros(shape, dtype=np.int64)
+    sums = np.zeros(shape, dtype=np.float64)
+    hits = np.zeros(shape, dtype=np.int64)
+    totals = np.zeros(shape, dtype=np.int64)
+    for i, (perf, rotation) in enumerate(counters):
+        counts[i, :len(perf.counts)] = perf.counts.sum(axis=1)
+        sums[i, :len(perf.sums)] = perf.sums.sum(axis=1)
+        hits[i, :len(rotation.hits)] = rotation.hits
+        totals[i, :len(rotation.hits)] = rotation.hits + rotation.misses
+    return {
+        'count': counts,
+        'avgresp': _average(sums, counts),
+        'hitratio': np.where(totals > 0,
+                             hits / np.maximum(totals, 1).astype(float),
+                             np.nan),
+    }
+
+
+def count_disk_performance(paths, chunk_size=_CHUNK_SIZE, num_workers=1):
+    '''
+    Return a DiskPerfCounter of the disk traces of the paths.
+    '''
+    return count_traces(DiskPerfCounter, paths, chunk_size, num_workers)
+
+
+def calc_disk_performance(paths, chunk_size=_CHUNK_SIZE, num_workers=1):
+    '''
+    Return the performance table of the disk traces of the paths.
+    '''
+    return count_disk_performance(paths, chunk_size, num_workers).get_table()
+
+
+def calc_tail_latency(paths, chunk_size=_CHUNK_SIZE, num_workers=1):
+    '''
+    Return the percentiles of _QUANTILES of the response times of all the
+    accesses in the disk traces of the paths.
+    '''
+    counter = count_disk_performance(paths, chunk_size, num_workers)
+    return tuple(get_percentiles(counter.get_histogram()))
+
+
+def calc_rotation_ratio(paths, chunk_size=_CHUNK_SIZE, num_workers=1):
+    '''
+    Return the rotation ratio table of RotationCounter.get_table() of the
+    traces of DiskRotationRatio.out of the paths.
+    '''
+    return count_traces(RotationCounter, paths, chunk_size,
+                        num_workers).get_table()
+
+
+def calc_window_performance(paths, window=_WINDOW, chunk_size=_CHUNK_SIZE,
+                            num_workers=1):
+    '''
+    Return the table of WindowPerfCounter.get_table() of the disk traces
+    of the paths.
+    '''
+    return count_traces(functools.partial(WindowPerfCounter, window), paths,
+                        chunk_size, num_workers).get_table()
+
+
+def calc_window_rotation_ratio(paths, window=_WINDOW, chunk_size=_CHUNK_SIZE,
+                               num_workers=1):
+    '''
+    Return the table of WindowRotationCounter.get_table() of the traces of
+    DiskRotationRatio.out of the paths.
+    '''
+    return count_traces(functools.partial(WindowRotationCounter, window),
+                        paths, chunk_size, num_workers).get_table()
+
+
+def format_table(table):
+    '''
+    Return the lines of the table in the format of calcDiskPerformance.awk.
+    '''
+    return [_PERF_FORMAT % tuple(row) for row in table.tolist()]
+
+
+def format_percentile_table(table):
+    '''
+    Return the lines of the percentile table.
+    '''
+    return [_PERCENTILE_FORMAT % tuple(row) for row in table.tolist()]
+
+
+def format_rotation_table(table):
+    '''
+    Return the lines of the table in the format of calcDiskRotationRatio.awk.
+    '''
+    return ['diskid: %04d\thit: %8d\tmiss: %6d\thit ratio: %.4f' % tuple(row)
+            for row in table.tolist()]
+
+
+def format_window_table(table):
+    '''
+    Return the lines of the table of calc_window_performance.
+    '''
+    return [_WINDOW_FORMAT % tuple(row) for row in table.tolist()]
+
+
+def format_window_rotation_table(table):
+    '''
+    Return the lines of the table of calc_window_rotation_ratio.
+    '''
+    return [_ROTATION_WINDOW_FORMAT % tuple(row) for row in table.tolist()]
+
+
+def print_usage(command_name):
+    sys.stdout.write('''
+Usage:
+
+python %s [-C<bytes>] [-j[n]] [-P|-H|-R] [-W<seconds>] CacheDiskPerf.out(DataDiskPerf.out) ...
+
+  The traces converted by tracecols.py are read from <trace>.cols. The
+  traces compressed by gzip, bzip2, xz or zstd (<trace>.gz, .bz2, .xz,
+  .zst) are decompressed while they are read. A compressed trace is not
+  split by -j, but the compressed traces are read in parallel.
+
+  -C<bytes>  read the traces by chunks of <bytes> bytes.
+             (default: %d)
+  -j[n]      split the traces into n shards and count them with n worker
+             processes. n defaults to the number of CPUs.
+  -P         print the p50/p95/p99/p99.9 response times per disk and
+             operation type instead of the averages.
+  -H         print the histograms of the response times per disk and
+             operation type. le is the upper bound of a bucket.
+  -R         print the rotation ratios of DiskRotationRatio.out like
+             calcDiskRotationRatio.awk.
+  -W<seconds>
+             print the counts, the average and the maximum response
+             times per window of <seconds> seconds of the arrival times,
+             disk and operation type, or the rotation ratios per window
+             and disk with -R. (default window: %g)
+''' % (command_name, _CHUNK_SIZE, _WINDOW))
+
+
+def main(args):
+    chunk_size = _CHUNK_SIZE
+    num_workers = 1
+    output = 'average'
+    window = None
+    paths = []
+    for item in args:
+        if item.startswith('-C'):
+            chunk_size = int(item[2:])
+        elif item.startswith('-j'):
+            if item[2:]:
+                num_workers = int(item[2:])
+            else:
+                num_workers = multiprocessing.cpu_count()
+        elif item == '-P':
+            output = 'percentile'
+        elif item == '-H':
+            output = 'histogram'
+        elif item == '-R':
+            output = 'rotation'
+        elif item.startswith('-W'):
+            window = float(item[2:] or _WINDOW)
+        else:
+            paths.append(item)
+
+    if window is not None:
+        if output == 'rotation':
+            lines = format_window_rotation_table(calc_window_rotation_ratio(
+                paths, window, chunk_size, num_workers))
+        else:
+            lines = format_window_table(calc_window_performance(
+                paths, window, chunk_size, num_workers))
+        for line in lines:
+            sys.stdout.write(line + '\n')
+        return
+
+    if output == 'rotation':
+        table = calc_rotation_ratio(paths, chunk_size, num_workers)
+        for line in format_rotation_table(table):
+            sys.stdout.write(line + '\n')
+        return
+
+    counter = count_disk_performance(paths, chunk_size, num_workers)
+    if output == 'percentile':
+        lines = format_percentile_table(counter.get_percentile_table())
+    elif output == 'histogram':
+        lines = counter.format_histogram()
+    else:
+        lines = format_table(counter.get_table())
+    for line in lines:
+        sys.stdout.write(line + '\n')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '-help'):
+        print_usage(sys.argv[0])
+        exit()
+
+    main(sys.argv[1:])
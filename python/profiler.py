@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+import os
+import json
+import time
+import cProfile
+import threading
+from contextlib import contextmanager
+
+'''
+Wall and CPU times, calls and counters of the stages of a run, which are
+printed by asmgraph.py --profile.
+
+The CPU times include the user and system times of the worker processes
+which have been waited for, so a stage which runs a process pool reports
+the CPU time of the pool after it has been joined.
+'''
+
+
+def get_cpu_time():
+    '''
+    Return the user and system times of this process and its waited
+    children in seconds.
+    '''
+    return sum(os.times()[:4])
+
+
+class Profiler(object):
+    '''
+    Record the stages of a run. If cprofile_stage is given, the calls of
+    that stage are also recorded by cProfile and saved to cprofile_path
+    by save_cprofile().
+    '''
+
+    def __init__(self, cprofile_stage=None, cprofile_path=None):
+        self.stages = {}
+        self.order = []
+        self.lock = threading.Lock()
+        self.cprofile_stage = cprofile_stage
+        self.cprofile_path = cprofile_path
+        self.cprofile = None
+        if cprofile_stage:
+            self.cprofile = cProfile.Profile()
+
+    def _get(self, name):
+        if name not in self.stages:
+            self.stages[name] = {'calls': 0, 'wall': 0.0, 'cpu': 0.0,
+                                 'counters': {}}
+            self.order.append(name)
+        return self.stages[name]
+
+    def add(self, name, wall, cpu, calls=1):
+        with self.lock:
+            stage = self._get(name)
+            stage['calls'] += calls
+            stage['wall'] += wall
+            stage['cpu'] += cpu
+
+    def count(self, name, counter, n=1):
+        with self.lock:
+            counters = self._get(name)['counters']
+            counters[counter] = counters.get(counter, 0) + n
+
+    @contextmanager
+    def stage(self, name):
+        '''
+        Record the times of the block as a call of the stage.
+        '''
+        with self.lock:
+            self._get(name)
+        profile = self.cprofile if name == self.cprofile_stage else None
+        if profile is not None:
+            profile.enable()
+        wall = time.time()
+        cpu = get_cpu_time()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            self.add(name, time.time() - wall, get_cpu_time() - cpu)
+
+    def save_cprofile(self):
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(self.cprofile_path)
+
+    def to_dict(self):
+        return {'stages': [dict(self.stages[name], name=name)
+                           for name in self.order]}
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1, sort_keys=True)
+
+    def format_table(self):
+        '''
+        Return the lines of the table of the stages in the order in which
+        they were started.
+        '''
+        lines = ['%-20s %8s %10s %10s  %s'
+                 % ('stage', 'calls', 'wall[s]', 'cpu[s]', 'counters')]
+        for name in self.order:
+            stage = self.stages[name]
+            counters = ' '.join('%s=%d' % kv
+                                for kv in sorted(stage['counters'].items()))
+            lines.append('%-20s %8d %10.3f %10.3f  %s'
+                         % (name, stage['calls'], stage['wall'],
+                            stage['cpu'], counters))
+        return lines
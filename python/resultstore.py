@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+import os
+import json
+import sqlite3
+import logging
+
+'''
+Persistent store of parsed simulation results.
+
+Each summary file is stored as one row keyed by its path together with
+the mtime and the size of the file, so a file is parsed again only when
+it is new or it has been changed. The parameters extracted from the file
+name by path_filter are kept in their own indexed columns and the parsed
+values are kept as a JSON text.
+'''
+
+# the filter parameters which are queried by -COND
+_INDEXED_COLUMNS = (
+    'num_mem',
+    'rep_level',
+    'storage_manager',
+    'mem_assignor',
+    'memory_manager',
+    'buffer_manager',
+    'wl_hour',
+    'wl_read_ratio',
+    'wl_lambda',
+    'wl_zipf_factor',
+    'wl_data_size',
+)
+
+
+class ResultStore:
+
+    def __init__(self, path, columns, version=0):
+        '''
+        path:    the path of the sqlite database file.
+        columns: the parameter names of the path filter.
+        version: the layout version of the stored records. The store is
+                 rebuilt when it differs from the version of the file.
+        '''
+        self.path = path
+        self.columns = tuple(columns)
+        self.version = version
+        self.conn = sqlite3.connect(path)
+        self.create_tables()
+
+    def create_tables(self):
+        cur = self.conn.cursor()
+        if cur.execute('PRAGMA user_version').fetchone()[0] != self.version:
+            logging.info('rebuild result store: ' + self.path)
+            cur.execute('DROP TABLE IF EXISTS results')
+            cur.execute('PRAGMA user_version = %d' % self.version)
+
+        cur.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'path TEXT PRIMARY KEY, mtime REAL, size INTEGER, %s, data TEXT)'
+            % ', '.join(c + ' TEXT' for c in self.columns))
+        for c in self.columns:
+            if c in _INDEXED_COLUMNS:
+                cur.execute(
+                    'CREATE INDEX IF NOT EXISTS results_%s ON results (%s)'
+                    % (c, c))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def get_stats(self):
+        '''
+        Return a dictionary which maps the stored paths to the tuples of
+        the mtime and the size of them.
+        '''
+        cur = self.conn.execute('SELECT path, mtime, size FROM results')
+        return dict((row[0], (row[1], row[2])) for row in cur)
+
+    def put(self, path, mtime, size, params, record):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO results (path, mtime, size, %s, data) '
+            'VALUES (?, ?, ?, %s, ?)'
+            % (', '.join(self.columns), ', '.join('?' * len(self.columns))),
+            [path, mtime, size]
+            + [params.get(c) for c in self.columns]
+            + [json.dumps(record)])
+
+    def remove(self, paths):
+        self.conn.executemany(
+            'DELETE FROM results WHERE path = ?', [(p,) for p in paths])
+
+    def commit(self):
+        self.conn.commit()
+
+    def query(self, conditions):
+        '''
+        Return the pairs of the path and the stored record which match
+        all of the conditions, in the order of the paths.
+        '''
+        for k in conditions:
+            if k not in self.columns:
+                return []
+        sql = 'SELECT path, data FROM results'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(k + ' = ?' for k in conditions)
+        sql += ' ORDER BY path'
+        cur = self.conn.execute(sql, list(conditions.values()))
+        return [(row[0], json.loads(row[1])) for row in cur]
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import asmgraph
+
+'''
+Tests of asmgraph.py. Run them with
+
+  python -m unittest test_asmgraph
+
+in this directory.
+'''
+
+_TESTDATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'testdata', 'summary')
+
+
+class UpdateSimResultsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.name = sorted(os.listdir(_TESTDATA_DIR))[0]
+        shutil.copy(os.path.join(_TESTDATA_DIR, self.name), self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_skips_complete_summary_without_fields(self):
+        # a file which looks complete to --watch but has none of the
+        # fields of the x tick labels
+        name = self.name.replace('rr0', 'rr3')
+        path = os.path.join(self.root, name)
+        with open(path, 'w') as f:
+            f.write('garbage\nx\nElapsed Time: 1[s]\n')
+        self.assertTrue(asmgraph.is_complete(path))
+
+        results = {}
+        stats = {}
+        paths = [os.path.join(self.root, n) for n in (self.name, name)]
+        objs, removed = asmgraph.update_sim_results(results, stats, paths)
+        self.assertEqual([obj.path for obj in objs], [paths[0]])
+        self.assertEqual(list(results), [paths[0]])
+        # the file is parsed again by the next update
+        self.assertNotIn(path, stats)
+
+        asmgraph._to_plot_list = ['energy']
+        asmgraph._output_dir = self.root
+        tasks = asmgraph.get_render_tasks(list(results.values()))
+        self.assertEqual(len(tasks), len(asmgraph._file_formats))
+
+
+if __name__ == '__main__':
+    unittest.main()
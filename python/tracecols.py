@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+
+import os
+import re
+import sys
+import json
+import logging
+
+import numpy as np
+
+from compressed import open_file
+
+logging.basicConfig(level=logging.INFO)
+
+'''
+Reading of the disk traces and their columnar binary format.
+
+The disk traces (DataDiskPerf.out, CacheDiskPerf.out, DiskRotationRatio.out)
+are CSV files with a header line. convert() writes a trace once into the
+directory <trace>.cols, which has one raw binary file per column and
+meta.json. The numeric columns are int32, int64 or float64, which are
+widened while converting when a later value does not fit, and the other
+columns (the operation types, the rotation flags) are int8 codes of their
+categories, or int16 when there are many of them. ColumnarTrace opens the
+columns with numpy.memmap, so the analyses scan them without parsing nor
+copying the whole trace.
+'''
+
+_CHUNK_SIZE = 16 * 1024 * 1024
+# a trace is not split into the shards smaller than this
+_MIN_SHARD_SIZE = 1024 * 1024
+
+_COLUMNS_SUFFIX = '.cols'
+_META_NAME = 'meta.json'
+# category code types in the order of widening
+_CATEGORY_DTYPES = ('int8', 'int16')
+
+# numeric column types in the order of widening
+_NUMERIC_DTYPES = ('int32', 'int64', 'float64')
+_FLOAT_CHARS = re.compile(r'[.eEnN]')
+
+
+def read_chunks(f, chunk_size=_CHUNK_SIZE, end=None):
+    '''
+    This generator reads the file by chunk_size bytes and yields the
+    chunks which end at the line boundaries. If end is given the file is
+    read up to the offset of end, which should be a line boundary.
+    '''
+    rest = ''
+    while True:
+        size = chunk_size
+        if end is not None:
+            size = min(size, end - f.tell())
+        chunk = f.read(size) if size > 0 else ''
+        if not chunk:
+            break
+        chunk = rest + chunk
+        last = chunk.rfind('\n') + 1
+        if last == 0:
+            rest = chunk
+            continue
+        rest = chunk[last:]
+        yield chunk[:last]
+    if rest:
+        yield rest
+
+
+def get_shards(path, num_shards, min_size=_MIN_SHARD_SIZE):
+    '''
+    Split the lines of the CSV trace after the header into at most
+    num_shards byte ranges of about the same size, and return the list
+    of the (start, end) offsets of them. The ranges begin at the line
+    boundaries.
+    '''
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.readline()
+        start = f.tell()
+        num_shards = max(1, min(num_shards, (size - start) // min_size))
+        offsets = [start]
+        for i in range(1, num_shards):
+            f.seek(max(offsets[-1], start + (size - start) * i // num_shards))
+            f.readline()
+            offsets.append(min(f.tell(), size))
+    offsets.append(size)
+    return [(s, e) for s, e in zip(offsets[:-1], offsets[1:]) if s < e]
+
+
+def split_fields(chunk, num_columns):
+    '''
+    Return the fields of the lines of the chunk as one list, in which the
+    fields of column i are [i::num_columns]. The empty lines are dropped.
+    '''
+    chunk = chunk.replace('\r', '').strip('\n')
+    while '\n\n' in chunk:
+        chunk = chunk.replace('\n\n', '\n')
+    if not chunk:
+        return []
+    fields = chunk.replace('\n', ',').split(',')
+    if len(fields) % num_columns != 0:
+        raise ValueError('the lines do not have %d columns' % num_columns)
+    return fields
+
+
+def to_array(values, dtype):
+    '''
+    Convert the strings of the numbers to an array of dtype.
+    '''
+    # numpy.fromstring converts the numbers in C, which is much faster than
+    # numpy.array of the strings, but it stops at a malformed value.
+    a = np.fromstring(' '.join(values), dtype=dtype, sep=' ')
+    if len(a) != len(values):
+        raise ValueError('malformed number in the column')
+    return a
+
+
+def _numeric_array(values):
+    '''
+    Return the values as an array of the narrowest dtype of
+    _NUMERIC_DTYPES, or None if they are not numbers.
+    '''
+    # numpy.fromstring reads the integer part of '0.5' as an int64, which
+    # passes the check of to_array when it is the last value
+    if _FLOAT_CHARS.search(' '.join(values)):
+        a = None
+    else:
+        try:
+            a = to_array(values, np.int64)
+        except ValueError:
+            a = None
+    if a is None:
+        try:
+            return to_array(values, np.float64)
+        except ValueError:
+            return None
+    info = np.iinfo(np.int32)
+    if len(a) == 0 or (a.min() >= info.min and a.max() <= info.max):
+        return a.astype(np.int32)
+    return a
+
+
+class _ColumnWriter(object):
+    '''
+    Append the values of a column to its binary file.
+    '''
+
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        self.dtype = None
+        self.categories = None
+        self.f = open(path, 'wb')
+
+    def write(self, values):
+        if self.dtype is None:
+            a = _numeric_array(values)
+            if a is None:
+                self.dtype = _CATEGORY_DTYPES[0]
+                self.categories = {}
+            else:
+                self.dtype = a.dtype.name
+        elif self.categories is None:
+            a = _numeric_array(values)
+            if a is None:
+                raise ValueError('non-numeric value in column ' + self.name)
+            if (_NUMERIC_DTYPES.index(a.dtype.name)
+                > _NUMERIC_DTYPES.index(self.dtype)):
+                self.widen(a.dtype.name)
+
+        if self.categories is not None:
+            a = self.encode(values)
+        a.astype(self.dtype).tofile(self.f)
+
+    def encode(self, values):
+        uniques, inverse = np.unique(np.array(values), return_inverse=True)
+        codes = np.array([self.categories.setdefault(v, len(self.categories))
+                          for v in uniques.tolist()], dtype=np.int64)
+        if len(self.categories) > np.iinfo(self.dtype).max + 1:
+            if self.dtype == _CATEGORY_DTYPES[-1]:
+                raise ValueError('too many categories in column ' + self.name)
+            self.widen(_CATEGORY_DTYPES[_CATEGORY_DTYPES.index(self.dtype) + 1])
+        return codes[inverse]
+
+    def widen(self, dtype):
+        '''
+        Rewrite the values written so far in the wider dtype.
+        '''
+        self.f.close()
+        a = np.fromfile(self.path, dtype=self.dtype).astype(dtype)
+        self.f = open(self.path, 'wb')
+        a.tofile(self.f)
+        self.dtype = dtype
+
+    def close(self):
+        self.f.close()
+
+    def get_meta(self):
+        categories = None
+        if self.categories is not None:
+            categories = sorted(self.categories, key=self.categories.get)
+        return {
+            'name': self.name,
+            'file': os.path.basename(self.path),
+            'dtype': self.dtype or 'float64',
+            'categories': categories,
+        }
+
+
+def get_columns_dir(path):
+    return path + _COLUMNS_SUFFIX
+
+
+def convert(path, outdir=None, chunk_size=_CHUNK_SIZE):
+    '''
+    Write the CSV trace of the path into the columnar format and return
+    the directory of it, which is <path>.cols unless outdir is given.
+    '''
+    outdir = outdir or get_columns_dir(path)
+    if not os.path.exists(outdir):
+        os.makedirs(outdir)
+    # meta.json is written last, so a broken conversion is never opened
+    meta_path = os.path.join(outdir, _META_NAME)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    st = os.stat(path)
+    with open_file(path) as f:
+        names = [n.strip() for n in f.readline().strip().split(',')]
+        writers = [_ColumnWriter(os.path.join(outdir, 'c%d.bin' % i), name)
+                   for i, name in enumerate(names)]
+        rows = 0
+        try:
+            for chunk in read_chunks(f, chunk_size):
+                fields = split_fields(chunk, len(names))
+                for i, writer in enumerate(writers):
+                    writer.write(fields[i::len(names)])
+                rows += len(fields) // len(names)
+        finally:
+            for writer in writers:
+                writer.close()
+
+    meta = {
+        'source': os.path.abspath(path),
+        'mtime': st.st_mtime,
+        'size': st.st_size,
+        'rows': rows,
+        'columns': [writer.get_meta() for writer in writers],
+    }
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=1)
+    logging.info('converted %s: %d rows, %d bytes to %d bytes'
+                 % (path, rows, st.st_size, get_dir_size(outdir)))
+    return outdir
+
+
+def get_dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, name))
+               for name in os.listdir(path))
+
+
+class ColumnarTrace(object):
+    '''
+    A trace in the columnar format. The columns are numpy.memmap arrays
+    which are opened when they are accessed first.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, _META_NAME)) as f:
+            self.meta = json.load(f)
+        self.rows = self.meta['rows']
+        self.names = [c['name'] for c in self.meta['columns']]
+        self._columns = {}
+
+    def __len__(self):
+        return self.rows
+
+    def _index(self, column):
+        if isinstance(column, int):
+            return column
+        return self.names.index(column)
+
+    def column(self, column):
+        '''
+        Return the values of the column given by the index or the name.
+        The values of a categorical column are the codes of
+        categories(column).
+        '''
+        i = self._index(column)
+        if i not in self._columns:
+            meta = self.meta['columns'][i]
+            if self.rows == 0:
+                a = np.zeros(0, dtype=meta['dtype'])
+            else:
+                a = np.memmap(os.path.join(self.path, meta['file']),
+                              dtype=meta['dtype'], mode='r',
+                              shape=(self.rows,))
+            self._columns[i] = a
+        return self._columns[i]
+
+    def categories(self, column):
+        '''
+        Return the categories of a categorical column, or None.
+        '''
+        return self.meta['columns'][self._index(column)]['categories']
+
+    def lookup(self, column, values, default=-1):
+        '''
+        Return an array which maps the codes of a categorical column to
+        the indexes of their categories in values, or default.
+        '''
+        values = list(values)
+        return np.array([values.index(c) if c in values else default
+                         for c in self.categories(column)], dtype=np.int64)
+
+    def equals(self, column, value):
+        '''
+        Return the mask of the rows whose column is the value.
+        '''
+        categories = self.categories(column)
+        if categories is None:
+            return self.column(column) == value
+        if value not in categories:
+            return np.zeros(self.rows, dtype=bool)
+        return self.column(column) == categories.index(value)
+
+
+def open_trace(path):
+    '''
+    Return the ColumnarTrace of the path, which is either a directory of
+    the columnar format or a CSV trace which has been converted after its
+    last change. Return None if there is no such columnar trace.
+    '''
+    if os.path.isdir(path):
+        return ColumnarTrace(path)
+    outdir = get_columns_dir(path)
+    if not os.path.exists(os.path.join(outdir, _META_NAME)):
+        return None
+    trace = ColumnarTrace(outdir)
+    st = os.stat(path)
+    if (trace.meta['mtime'], trace.meta['size']) != (st.st_mtime, st.st_size):
+        logging.warning('%s is older than %s' % (outdir, path))
+        return None
+    return trace
+
+
+def print_usage(command_name):
+    sys.stdout.write('''
+Usage:
+
+python %s [-C<bytes>] DataDiskPerf.out(CacheDiskPerf.out, DiskRotationRatio.out) ...
+
+  Convert the traces to the columnar format in <trace>.cols.
+
+  -C<bytes>  read the traces by chunks of <bytes> bytes.
+             (default: %d)
+''' % (command_name, _CHUNK_SIZE))
+
+
+def main(args):
+    chunk_size = _CHUNK_SIZE
+    for item in args:
+        if item.startswith('-C'):
+            chunk_size = int(item[2:])
+        else:
+            convert(item, chunk_size=chunk_size)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '-help'):
+        print_usage(sys.argv[0])
+        exit()
+
+    main(sys.argv[1:])